@@ -1,14 +1,30 @@
 import argparse
+import functools
 import logging
+import os
 import sys
 import signal
-from src.application import Application
-from src.utils.logging_config import setup_logging
+import threading
 logger = logging.getLogger("Main")
+
+# 需要优雅退出的信号（Windows 上只处理 SIGINT）
+SHUTDOWN_SIGNALS = {signal.SIGINT, signal.SIGTERM}
+
+# 解释器切换线程的间隔（秒），默认 5ms。编解码在 ctypes 调用中已释放 GIL，
+# 调大可减少纯 Python 线程之间的强制切换；但音频流回调也要等待 GIL，不宜超过一帧的几分之一
+SWITCH_INTERVAL = 0.01
+
+# 收到退出信号时置位；应用实例尚未创建时由 main() 在创建后检查
+_shutdown_requested = threading.Event()
+
+# 常用日志文本
+_MSG_START = "应用程序已启动，按Ctrl+C退出"
+_MSG_SIGINT = "接收到中断信号，正在关闭..."
 # 配置日志
 
-def parse_args():
-    """解析命令行参数"""
+@functools.lru_cache(maxsize=1)
+def _build_parser():
+    """构建命令行解析器，只在首次使用时创建"""
     parser = argparse.ArgumentParser(description='小智ai客户端')
     
     # 添加界面模式参数
@@ -32,30 +48,98 @@ def parse_args():
         default='https://xiaozhi.me/login',
         help='小智ai服务器地址'
     )
-    
-    return parser.parse_args()
+
+    return parser
+
+
+def parse_args():
+    """解析命令行参数"""
+    return _build_parser().parse_args()
+
+def _request_shutdown():
+    """请求退出：应用已创建时通知应用，否则只置位标志，不在信号线程中创建单例"""
+    _shutdown_requested.set()
+    application = sys.modules.get("src.application")
+    app = application.Application._instance if application else None
+    if app is not None:
+        # 只请求退出，界面关闭后由主线程中的 run() 完成清理
+        try:
+            app.request_shutdown()
+        except Exception as e:
+            # 实例仍在初始化中，main() 创建完成后会检查退出标志
+            logger.warning("请求退出失败: %s", e)
+
+
+def _force_exit(sig):
+    """关闭过程卡住时再次收到退出信号，直接结束进程"""
+    logger.warning("再次接收到信号 %s，强制退出", signal.Signals(sig).name)
+    os._exit(128 + sig)
+
 
 def signal_handler(sig, frame):
-    """处理Ctrl+C信号"""
-    logger.info("接收到中断信号，正在关闭...")
-    app = Application.get_instance()
-    app.shutdown()
-    sys.exit(0)
+    """处理Ctrl+C信号，只发出退出请求，关闭和日志落盘由主线程和 atexit 完成"""
+    if _shutdown_requested.is_set():
+        _force_exit(sig)
+    logger.info(_MSG_SIGINT)
+    _request_shutdown()
+
+
+def _ignore_signal(sig, frame):
+    """Python 层的处理函数不做任何事，信号由 wakeup fd 转交给 _wait_shutdown_signals 处理"""
+
+
+def _wait_shutdown_signals(read_fd):
+    """在独立线程中等待退出信号，关闭逻辑不在信号处理上下文中执行
+
+    C 层信号处理函数把信号编号写入 wakeup fd，这里持续读取：第一次请求正常退出，再次收到时强制退出
+    """
+    while True:
+        sig = os.read(read_fd, 1)[0]
+        if sig not in SHUTDOWN_SIGNALS:
+            continue
+        if _shutdown_requested.is_set():
+            _force_exit(sig)
+        logger.info("接收到信号 %s，正在关闭...", signal.Signals(sig).name)
+        _request_shutdown()
+
+
+def install_signal_handlers():
+    """注册退出信号处理"""
+    if os.name == "posix":
+        # 不修改信号屏蔽字，否则 amixer、浏览器等子进程会继承被屏蔽的退出信号；
+        # 信号到达时由解释器的 C 层处理函数写入 wakeup fd，交给等待线程处理
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(write_fd, False)
+        signal.set_wakeup_fd(write_fd, warn_on_full_buffer=False)
+        for sig in SHUTDOWN_SIGNALS:
+            signal.signal(sig, _ignore_signal)
+        threading.Thread(target=_wait_shutdown_signals, args=(read_fd,), daemon=True).start()
+    else:
+        signal.signal(signal.SIGINT, signal_handler)
 
 
 def main():
     """程序入口点"""
-    # 注册信号处理器
-    signal.signal(signal.SIGINT, signal_handler)
-    # 解析命令行参数
+    # 解析命令行参数，--help 或参数错误会在这里直接退出
     args = parse_args()
+    # 注册信号处理器，需在主线程中、创建应用之前完成
+    install_signal_handlers()
+    sys.setswitchinterval(SWITCH_INTERVAL)
+
+    # 参数解析通过后再导入重量级模块，--help 或参数错误时无需加载整个应用
+    from src.application import Application
+    from src.utils.logging_config import setup_logging
+
     try:
         # 日志
         setup_logging()
         # 创建并运行应用程序
         app = Application.get_instance()
+        # 创建应用前已收到退出信号
+        if _shutdown_requested.is_set():
+            app.request_shutdown()
 
-        logger.info("应用程序已启动，按Ctrl+C退出")
+        logger.info(_MSG_START)
 
         # 启动应用，传入参数
         app.run(
@@ -65,7 +149,7 @@ def main():
         )
 
     except Exception as e:
-        logger.error(f"程序发生错误: {e}", exc_info=True)
+        logger.error("程序发生错误: %s", e, exc_info=True)
         return 1
 
     return 0
@@ -1,9 +1,14 @@
 import asyncio
-import json
 import logging
+import re
 import threading
 import time
 import sys
+import webbrowser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
 from src.utils.system_info import setup_opus
 
 
@@ -18,15 +23,67 @@ except Exception as e:
     print("请确保 opus 动态库已正确安装或位于正确的位置")
     sys.exit(1)
 
+# uvloop 为可选依赖（不支持 Windows），安装后事件循环改用其 C 实现
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# pyperclip 为可选依赖，缺失时只跳过复制验证码
+try:
+    import pyperclip
+except ImportError:
+    pyperclip = None
+
 from src.protocols.mqtt_protocol import MqttProtocol
-from src.constants.constants import DeviceState, EventType, AudioConfig, AbortReason, ListeningMode
+from src.constants.constants import DeviceState, AbortReason, ListeningMode
 from src.display import gui_display,cli_display
 from src.protocols.websocket_protocol import WebsocketProtocol
+from src.protocols.protocol import json_loads
 from src.utils.config_manager import ConfigManager
 
 # 配置日志
 logger = logging.getLogger("Application")
 
+# 服务端提示文本中的验证码
+_VCODE_RE = re.compile(r'验证码：(\d+)')
+
+# TTS 结束后等待剩余音频播放完的最长时间（秒）
+TTS_DRAIN_TIMEOUT = 30.0
+
+# 状态对应的显示文本（只读）
+STATUS_TEXTS = MappingProxyType({
+    DeviceState.IDLE: "待命",
+    DeviceState.CONNECTING: "连接中...",
+    DeviceState.LISTENING: "聆听中...",
+    DeviceState.SPEAKING: "说话中..."
+})
+
+# 表情名称对应的图标（只读）
+EMOTION_ICONS = MappingProxyType({
+    "neutral": "😶",
+    "happy": "🙂",
+    "laughing": "😆",
+    "funny": "😂",
+    "sad": "😔",
+    "angry": "😠",
+    "crying": "😭",
+    "loving": "😍",
+    "embarrassed": "😳",
+    "surprised": "😲",
+    "shocked": "😱",
+    "thinking": "🤔",
+    "winking": "😉",
+    "cool": "😎",
+    "relaxed": "😌",
+    "delicious": "🤤",
+    "kissy": "😘",
+    "confident": "😏",
+    "sleepy": "😴",
+    "silly": "😜",
+    "confused": "🙄"
+})
+
 
 class Application:
     """智能音箱应用程序主类"""
@@ -57,18 +114,35 @@ class Application:
         self.aborted = False
         self.current_text = ""
         self.current_emotion = "neutral"
+        # 界面会定时轮询状态文本和表情，在变化时算好缓存起来
+        self._status_text = STATUS_TEXTS[self.device_state]
+        self._emotion_icon = EMOTION_ICONS[self.current_emotion]
 
         # 音频处理相关
         self.audio_codec = None  # 将在 _initialize_audio 中初始化
 
         # 事件循环和线程
-        self.loop = asyncio.new_event_loop()
+        self.loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
         self.loop_thread = None
         self.running = False
+        # 退出请求标志，信号线程只设置标志，实际关闭在主线程完成
+        self.shutdown_requested = threading.Event()
 
-        # 任务队列和锁
-        self.main_tasks = []
+        # 任务队列，deque 的 append/popleft 本身是原子操作，生产和消费都不需要加锁
+        self.main_tasks = deque()
+        # 保护中止语音任务的待执行标志，已有中止任务在等待执行时重复的请求直接忽略
         self.mutex = threading.Lock()
+        self._abort_pending = False
+        # 唤醒词检测器启停、音频流重建、打开浏览器等会阻塞的操作交给单个工作线程按提交顺序执行，
+        # 事件循环同时负责音频收发，不能被这些操作卡住
+        self._blocking_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AppBlocking")
+
+        # 服务端 JSON 消息类型对应的处理方法
+        self._msg_handlers = {
+            "tts": self._handle_tts_message,
+            "stt": self._handle_stt_message,
+            "llm": self._handle_llm_message,
+        }
 
         # 协议实例
         self.protocol = None
@@ -76,19 +150,11 @@ class Application:
         # 回调函数
         self.on_state_changed_callbacks = []
 
-        # 初始化事件对象
-        self.events = {
-            EventType.SCHEDULE_EVENT: threading.Event(),
-            EventType.AUDIO_INPUT_READY_EVENT: threading.Event(),
-            EventType.AUDIO_OUTPUT_READY_EVENT: threading.Event()
-        }
-
         # 创建显示界面
         self.display = None
 
-        # 添加唤醒词检测器
+        # 唤醒词检测器，在 _initialize_without_connect 中创建（加载模型较慢，只加载一次）
         self.wake_word_detector = None
-        self._initialize_wake_word_detector()
 
     def run(self, **kwargs):
         """启动应用程序"""
@@ -99,6 +165,7 @@ class Application:
         host = kwargs.get('host', 'https://xiaozhi.me/login')
 
         self.set_protocol_type(protocol)
+        self.running = True
 
         # 创建并启动事件循环线程
         self.loop_thread = threading.Thread(target=self._run_event_loop)
@@ -111,13 +178,11 @@ class Application:
         # 初始化应用程序（移除自动连接）
         asyncio.run_coroutine_threadsafe(self._initialize_without_connect(), self.loop)
 
-        # 启动主循环线程
-        main_loop_thread = threading.Thread(target=self._main_loop)
-        main_loop_thread.daemon = True
-        main_loop_thread.start()
         self.set_display_type(mode)
-        # 启动GUI
-        self.display.start()
+        # 启动GUI，界面关闭（或收到退出请求）后返回
+        if not self.shutdown_requested.is_set():
+            self.display.start()
+        self.shutdown()
 
     def _run_event_loop(self):
         """运行事件循环的线程函数"""
@@ -131,20 +196,20 @@ class Application:
         # 设置设备状态为待命
         self.set_device_state(DeviceState.IDLE)
 
+        # 待发送的音频由单个协程顺序发送，最多缓存约 3 秒
+        self._send_audio_queue = asyncio.Queue(maxsize=50)
+        self._send_audio_task = self.loop.create_task(self._send_audio_loop())
+
         # 初始化音频编解码器
         self._initialize_audio()
 
         # 初始化并启动唤醒词检测
         self._initialize_wake_word_detector()
         if self.wake_word_detector:
-            self.wake_word_detector.start()
+            self._run_blocking(self.wake_word_detector.start)
 
         # 设置协议回调
-        self.protocol.on_network_error = self._on_network_error
-        self.protocol.on_incoming_audio = self._on_incoming_audio
-        self.protocol.on_incoming_json = self._on_incoming_json
-        self.protocol.on_audio_channel_opened = self._on_audio_channel_opened
-        self.protocol.on_audio_channel_closed = self._on_audio_channel_closed
+        self._bind_protocol()
 
         logger.info("应用程序初始化完成")
 
@@ -153,9 +218,13 @@ class Application:
         try:
             from src.audio_codecs.audio_codec import AudioCodec
             self.audio_codec = AudioCodec()
+            # 编码线程每帧只唤醒事件循环把数据放入发送队列，状态和通道检查都在事件循环中进行
+            self.audio_codec.on_input_audio = partial(
+                self.loop.call_soon_threadsafe, self._queue_audio_for_send
+            )
             logger.info("音频编解码器初始化成功")
         except Exception as e:
-            logger.error(f"初始化音频设备失败: {e}")
+            logger.error("初始化音频设备失败: %s", e)
             self.alert("错误", f"初始化音频设备失败: {e}")
 
     def _initialize_display(self):
@@ -171,14 +240,14 @@ class Application:
             emotion_callback=self._get_current_emotion,
             mode_callback=self._on_mode_changed,
             auto_callback=self.toggle_chat_state,
-            abort_callback=lambda: self.abort_speaking(AbortReason.WAKE_WORD_DETECTED)
+            abort_callback=lambda: self.schedule_abort(AbortReason.WAKE_WORD_DETECTED)
         )
 
     def _initialize_cli(self):
         self.display = cli_display.CliDisplay()
         self.display.set_callbacks(
             auto_callback=self.toggle_chat_state,
-            abort_callback=lambda: self.abort_speaking(AbortReason.WAKE_WORD_DETECTED),
+            abort_callback=lambda: self.schedule_abort(AbortReason.WAKE_WORD_DETECTED),
             status_callback=self._get_status_text,
             text_callback=self._get_current_text,
             emotion_callback=self._get_current_emotion
@@ -197,74 +266,101 @@ class Application:
         else:
             self._initialize_cli()
 
-    def _main_loop(self):
-        """应用程序主循环"""
-        logger.info("主循环已启动")
-        self.running = True
+    def _process_scheduled_tasks(self):
+        """处理调度任务，在事件循环线程中执行"""
+        popleft = self.main_tasks.popleft
+        while True:
+            try:
+                task = popleft()
+            except IndexError:
+                break
+            try:
+                result = task()
+                # 协程任务交给事件循环执行，不阻塞后续任务
+                if asyncio.iscoroutine(result):
+                    self.loop.create_task(result)
+            except Exception as e:
+                logger.error("执行调度任务时出错: %s", e)
 
-        while self.running:
-            # 等待事件
-            for event_type, event in self.events.items():
-                if event.is_set():
-                    event.clear()
+    def _run_blocking(self, func, *args):
+        """把会阻塞的调用交给工作线程执行，不等待结果，可在任意线程调用"""
+        try:
+            self._blocking_executor.submit(self._call_blocking, func, *args)
+        except RuntimeError:
+            # 正在关闭，工作线程已停止接收任务
+            pass
+
+    @staticmethod
+    def _call_blocking(func, *args):
+        """在工作线程中执行调用并记录异常"""
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error("执行 %s 时出错: %s", getattr(func, "__name__", func), e)
 
-                    if event_type == EventType.AUDIO_INPUT_READY_EVENT:
-                        self._handle_input_audio()
-                    elif event_type == EventType.AUDIO_OUTPUT_READY_EVENT:
-                        self._handle_output_audio()
-                    elif event_type == EventType.SCHEDULE_EVENT:
-                        self._process_scheduled_tasks()
+    def schedule(self, callback):
+        """调度任务到事件循环，可在任意线程调用"""
+        self.main_tasks.append(callback)
+        self.loop.call_soon_threadsafe(self._process_scheduled_tasks)
 
-            # 短暂休眠以避免CPU占用过高
-            time.sleep(0.01)
+    def schedule_abort(self, reason):
+        """调度中止语音任务，已有中止任务在等待执行时不再重复添加"""
+        with self.mutex:
+            if self._abort_pending:
+                return
+            self._abort_pending = True
+        self.main_tasks.append(partial(self._run_abort, reason))
+        self.loop.call_soon_threadsafe(self._process_scheduled_tasks)
 
-    def _process_scheduled_tasks(self):
-        """处理调度任务"""
+    def _run_abort(self, reason):
+        """执行调度的中止语音任务"""
         with self.mutex:
-            tasks = self.main_tasks.copy()
-            self.main_tasks.clear()
+            self._abort_pending = False
+        self.abort_speaking(reason)
 
-        for task in tasks:
-            try:
-                task()
-            except Exception as e:
-                logger.error(f"执行调度任务时出错: {e}")
+    def call_later(self, delay, callback):
+        """延迟 delay 秒后在事件循环中执行回调，可在任意线程调用，不额外创建线程"""
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, callback)
 
-    def schedule(self, callback):
-        """调度任务到主循环"""
-        with self.mutex:
-            # 如果是中止语音的任务，检查是否已经存在相同类型的任务
-            if 'abort_speaking' in str(callback):
-                # 如果已经有中止任务在队列中，就不再添加
-                if any('abort_speaking' in str(task) for task in self.main_tasks):
-                    return
-            self.main_tasks.append(callback)
-        self.events[EventType.SCHEDULE_EVENT].set()
-
-    def _handle_input_audio(self):
-        """处理音频输入"""
+    def _queue_audio_for_send(self, encoded_data):
+        """把待发送的音频放入队列，队列满时丢弃最旧的一帧，在事件循环线程中执行
+
+        只在聆听状态下采集麦克风，这里再丢弃离开聆听状态后编码线程中剩余的几帧；
+        通道是否打开由发送协程按批检查
+        """
         if self.device_state != DeviceState.LISTENING:
             return
+        if self._send_audio_queue.full():
+            self._send_audio_queue.get_nowait()
+        self._send_audio_queue.put_nowait(encoded_data)
 
-        encoded_data = self.audio_codec.read_audio()
-        if encoded_data and self.protocol and self.protocol.is_audio_channel_opened():
-            asyncio.run_coroutine_threadsafe(
-                self.protocol.send_audio(encoded_data),
-                self.loop
-            )
+    async def _send_audio_loop(self):
+        """发送协程，按顺序发送队列中的音频
 
-    def _handle_output_audio(self):
-        """处理音频输出"""
-        if self.device_state != DeviceState.SPEAKING:
-            return
+        服务端按一条消息一个 Opus 包解析，不能把多帧拼成一条消息；
+        网络变慢积压时一次取出所有积压的帧连续发送，每批只检查一次通道状态
+        """
+        send_queue = self._send_audio_queue
+        while self.running:
+            frames = [await send_queue.get()]
+            while not send_queue.empty():
+                frames.append(send_queue.get_nowait())
+            protocol = self.protocol
+            if not protocol or not protocol.is_audio_channel_opened():
+                continue
+            try:
+                for encoded_data in frames:
+                    await protocol.send_audio(encoded_data)
+            except Exception as e:
+                logger.error("发送音频数据时出错: %s", e)
 
-        self.audio_codec.play_audio()
 
     def _on_network_error(self, message):
         """网络错误回调"""
         self.keep_listening = False
         self.set_device_state(DeviceState.IDLE)
-        self.wake_word_detector.resume()
+        if self.wake_word_detector:
+            self._run_blocking(self.wake_word_detector.resume)
         if self.device_state != DeviceState.CONNECTING:
             logger.info("检测到连接断开")
             self.set_device_state(DeviceState.IDLE)
@@ -290,28 +386,25 @@ class Application:
                 )
 
             # 延迟一秒后尝试重新连接
-            def delayed_reconnect():
-                time.sleep(1)
-                asyncio.run_coroutine_threadsafe(self._reconnect(), self.loop)
+            self.call_later(1, lambda: self.loop.create_task(self._reconnect()))
 
-            threading.Thread(target=delayed_reconnect, daemon=True).start()
-
-    async def _reconnect(self):
-        """重新连接到服务器"""
-
-        # 设置协议回调
+    def _bind_protocol(self):
+        """把应用的回调绑定到当前协议实例，只需在创建协议后调用一次"""
         self.protocol.on_network_error = self._on_network_error
         self.protocol.on_incoming_audio = self._on_incoming_audio
         self.protocol.on_incoming_json = self._on_incoming_json
         self.protocol.on_audio_channel_opened = self._on_audio_channel_opened
         self.protocol.on_audio_channel_closed = self._on_audio_channel_closed
 
+    async def _reconnect(self):
+        """重新连接到服务器，重连复用同一个协议实例，回调在初始化时已绑定"""
+
         # 连接到服务器
         retry_count = 0
         max_retries = 3
 
         while retry_count < max_retries:
-            logger.info(f"尝试重新连接 (尝试 {retry_count + 1}/{max_retries})...")
+            logger.info("尝试重新连接 (尝试 %s/%s)...", retry_count + 1, max_retries)
             if await self.protocol.connect():
                 logger.info("重新连接成功")
                 self.set_device_state(DeviceState.IDLE)
@@ -320,8 +413,8 @@ class Application:
             retry_count += 1
             await asyncio.sleep(2)  # 等待2秒后重试
 
-        logger.error(f"重新连接失败，已尝试 {max_retries} 次")
-        self.schedule(lambda: self.alert("连接错误", "无法重新连接到服务器"))
+        logger.error("重新连接失败，已尝试 %s 次", max_retries)
+        self.schedule(partial(self.alert, "连接错误", "无法重新连接到服务器"))
         self.set_device_state(DeviceState.IDLE)
         return False
 
@@ -329,7 +422,6 @@ class Application:
         """接收音频数据回调"""
         if self.device_state == DeviceState.SPEAKING:
             self.audio_codec.write_audio(data)
-            self.events[EventType.AUDIO_OUTPUT_READY_EVENT].set()
 
     def _on_incoming_json(self, json_data):
         """接收JSON数据回调"""
@@ -339,39 +431,36 @@ class Application:
 
             # 解析JSON数据
             if isinstance(json_data, str):
-                data = json.loads(json_data)
+                data = json_loads(json_data)
             else:
                 data = json_data
 
-            # 处理不同类型的消息
+            # 按消息类型分发
             msg_type = data.get("type", "")
-            if msg_type == "tts":
-                self._handle_tts_message(data)
-            elif msg_type == "stt":
-                self._handle_stt_message(data)
-            elif msg_type == "llm":
-                self._handle_llm_message(data)
+            handler = self._msg_handlers.get(msg_type)
+            if handler:
+                handler(data)
             else:
-                logger.warning(f"收到未知类型的消息: {msg_type}")
+                logger.warning("收到未知类型的消息: %s", msg_type)
         except Exception as e:
-            logger.error(f"处理JSON消息时出错: {e}")
+            logger.error("处理JSON消息时出错: %s", e)
 
     def _handle_tts_message(self, data):
         """处理TTS消息"""
         state = data.get("state", "")
         if state == "start":
-            self.schedule(lambda: self._handle_tts_start())
+            self.schedule(self._handle_tts_start)
         elif state == "stop":
-            self.schedule(lambda: self._handle_tts_stop())
+            self.schedule(self._handle_tts_stop)
         elif state == "sentence_start":
             text = data.get("text", "")
             if text:
-                logger.info(f"<< {text}")
-                self.schedule(lambda: self.set_chat_message("assistant", text))
+                logger.info("<< %s", text)
+                self.schedule(partial(self.set_chat_message, "assistant", text))
 
                 # 检查是否包含验证码信息
                 if "请登录到控制面板添加设备，输入验证码" in text:
-                    self.schedule(lambda: self._handle_verification_code(text))
+                    self.schedule(partial(self._handle_verification_code, text))
 
     def _handle_tts_start(self):
         """处理TTS开始事件"""
@@ -383,107 +472,73 @@ class Application:
         if self.device_state == DeviceState.IDLE or self.device_state == DeviceState.LISTENING:
             self.set_device_state(DeviceState.SPEAKING)
 
-    def _handle_tts_stop(self):
+    async def _handle_tts_stop(self):
         """处理TTS停止事件"""
         if self.device_state == DeviceState.SPEAKING:
-            # 给音频播放一个缓冲时间，确保所有音频都播放完毕
-            def delayed_state_change():
-                # 等待音频队列清空
-                self.audio_codec.wait_for_audio_complete()
-
-                # 状态转换
-                if self.keep_listening:
-                    asyncio.run_coroutine_threadsafe(
-                        self.protocol.send_start_listening(ListeningMode.AUTO_STOP),
-                        self.loop
-                    )
-                    self.set_device_state(DeviceState.LISTENING)
-                else:
-                    self.set_device_state(DeviceState.IDLE)
-
-            # 安排延迟执行
-            threading.Thread(target=delayed_state_change, daemon=True).start()
+            # 等待已收到的音频播放完毕，播放完成由解码线程和输出回调通知，不再轮询
+            await self.loop.run_in_executor(None, self.audio_codec.wait_for_audio_complete, TTS_DRAIN_TIMEOUT)
+
+            # 等待期间可能已被打断或切换了状态，此时不再转换
+            if self.device_state != DeviceState.SPEAKING or self.aborted:
+                return
+
+            # 状态转换
+            if self.keep_listening:
+                await self.protocol.send_start_listening(ListeningMode.AUTO_STOP)
+                self.set_device_state(DeviceState.LISTENING)
+            else:
+                self.set_device_state(DeviceState.IDLE)
 
     def _handle_stt_message(self, data):
         """处理STT消息"""
         text = data.get("text", "")
         if text:
-            logger.info(f">> {text}")
-            self.schedule(lambda: self.set_chat_message("user", text))
+            logger.info(">> %s", text)
+            self.schedule(partial(self.set_chat_message, "user", text))
 
     def _handle_llm_message(self, data):
         """处理LLM消息"""
         emotion = data.get("emotion", "")
         if emotion:
-            self.schedule(lambda: self.set_emotion(emotion))
+            self.schedule(partial(self.set_emotion, emotion))
 
     async def _on_audio_channel_opened(self):
         """音频通道打开回调"""
         logger.info("音频通道已打开")
-        self.schedule(lambda: self._start_audio_streams())
+        self.schedule(self._start_audio_streams)
 
     def _start_audio_streams(self):
         """启动音频流"""
         try:
-            # 确保流已关闭后再重新打开
-            if self.audio_codec.input_stream and self.audio_codec.input_stream.is_active():
-                self.audio_codec.input_stream.stop_stream()
-
-            # 重新打开流
-            self.audio_codec.input_stream.start_stream()
-
-            if self.audio_codec.output_stream and self.audio_codec.output_stream.is_active():
-                self.audio_codec.output_stream.stop_stream()
-
-            # 重新打开流
-            self.audio_codec.output_stream.start_stream()
+            # 流由 PortAudio 回调驱动，不会积压旧数据，已在运行的流无需先停止再重启
+            if not self.audio_codec.input_stream.is_active():
+                self.audio_codec.input_stream.start_stream()
 
-            # 设置事件触发器
-            threading.Thread(target=self._audio_input_event_trigger, daemon=True).start()
-            threading.Thread(target=self._audio_output_event_trigger, daemon=True).start()
+            if not self.audio_codec.output_stream.is_active():
+                self.audio_codec.output_stream.start_stream()
 
             logger.info("音频流已启动")
         except Exception as e:
-            logger.error(f"启动音频流失败: {e}")
-
-    def _audio_input_event_trigger(self):
-        """音频输入事件触发器"""
-        while self.running:
-            try:
-                if self.audio_codec.input_stream and self.audio_codec.input_stream.is_active():
-                    self.events[EventType.AUDIO_INPUT_READY_EVENT].set()
-            except OSError as e:
-                logger.error(f"音频输入流错误: {e}")
-                # 如果流已关闭，尝试重新打开或者退出循环
-                if "Stream not open" in str(e):
-                    break
-            except Exception as e:
-                logger.error(f"音频输入事件触发器错误: {e}")
-
-            time.sleep(AudioConfig.FRAME_DURATION / 1000)  # 按帧时长触发
-
-    def _audio_output_event_trigger(self):
-        """音频输出事件触发器"""
-        while self.running and self.audio_codec.output_stream and self.audio_codec.output_stream.is_active():
-            # 当队列中有数据时才触发事件
-            if not self.audio_codec.audio_decode_queue.empty():  # 修改为使用 audio_codec 的队列
-                self.events[EventType.AUDIO_OUTPUT_READY_EVENT].set()
-            time.sleep(0.02)  # 稍微延长检查间隔
+            logger.error("启动音频流失败: %s", e)
 
     async def _on_audio_channel_closed(self):
         """音频通道关闭回调"""
         logger.info("音频通道已关闭")
         self.set_device_state(DeviceState.IDLE)
         self.keep_listening = False
-        # 在空闲状态下启动唤醒词检测
+        # 在空闲状态下启动唤醒词检测，启动会打开音频流，交给工作线程执行
         if self.wake_word_detector:
-            if not self.wake_word_detector.is_running():
-                logger.info("在空闲状态下启动唤醒词检测")
-                self.wake_word_detector.start()
-            elif self.wake_word_detector.paused:
-                logger.info("在空闲状态下恢复唤醒词检测")
-                self.wake_word_detector.resume()
-        self.schedule(lambda: self._stop_audio_streams())
+            self._run_blocking(self._activate_wake_word_detector)
+        self.schedule(self._stop_audio_streams)
+
+    def _activate_wake_word_detector(self):
+        """启动或恢复唤醒词检测，在工作线程中执行"""
+        if not self.wake_word_detector.is_running():
+            logger.info("在空闲状态下启动唤醒词检测")
+            self.wake_word_detector.start()
+        elif self.wake_word_detector.paused:
+            logger.info("在空闲状态下恢复唤醒词检测")
+            self.wake_word_detector.resume()
 
     def _stop_audio_streams(self):
         """停止音频流"""
@@ -496,7 +551,7 @@ class Application:
 
             logger.info("音频流已停止")
         except Exception as e:
-            logger.error(f"停止音频流失败: {e}")
+            logger.error("停止音频流失败: %s", e)
 
     def set_device_state(self, state):
         """设置设备状态"""
@@ -505,12 +560,18 @@ class Application:
 
         old_state = self.device_state
 
-        # 如果从 SPEAKING 状态切换出去，确保音频播放完成
-        if old_state == DeviceState.SPEAKING:
-            self.audio_codec.wait_for_audio_complete()
+        # 从 SPEAKING 状态切换出去时丢弃剩余音频。这里在事件循环中执行，不能阻塞等待播放：
+        # 正常结束的 TTS 已由 _handle_tts_stop 在线程池中等待播放完，其余路径（打断、断线）本就要停止播放
+        if old_state == DeviceState.SPEAKING and self.audio_codec:
+            self.audio_codec.clear_audio_queue()
 
         self.device_state = state
-        logger.info(f"状态变更: {old_state} -> {state}")
+        self._status_text = STATUS_TEXTS.get(state, "未知")
+        logger.info("状态变更: %s -> %s", old_state, state)
+
+        # 只在聆听状态下采集并编码麦克风数据
+        if self.audio_codec:
+            self.audio_codec.capture_enabled = state == DeviceState.LISTENING
 
         # 根据状态执行相应操作
         if state == DeviceState.IDLE:
@@ -521,7 +582,7 @@ class Application:
                 try:
                     self.audio_codec.output_stream.stop_stream()
                 except Exception as e:
-                    logger.warning(f"停止输出流时出错: {e}")
+                    logger.warning("停止输出流时出错: %s", e)
         elif state == DeviceState.CONNECTING:
             self.display.update_status("连接中...")
         elif state == DeviceState.LISTENING:
@@ -531,9 +592,9 @@ class Application:
                 try:
                     self.audio_codec.input_stream.start_stream()
                 except Exception as e:
-                    logger.warning(f"启动输入流时出错: {e}")
-                    # 使用 AudioCodec 类中的方法重新初始化
-                    self.audio_codec._reinitialize_input_stream()
+                    logger.warning("启动输入流时出错: %s", e)
+                    # 使用 AudioCodec 类中的方法重新初始化，重建流需要等待设备，不在事件循环中执行
+                    self._run_blocking(self.audio_codec._reinitialize_input_stream)
         elif state == DeviceState.SPEAKING:
             self.display.update_status("说话中...")
             # 确保输出流处于活跃状态
@@ -542,35 +603,29 @@ class Application:
                     try:
                         self.audio_codec.output_stream.start_stream()
                     except Exception as e:
-                        logger.warning(f"启动输出流时出错: {e}")
-                        # 使用 AudioCodec 类中的方法重新初始化
-                        self.audio_codec._reinitialize_output_stream()
+                        logger.warning("启动输出流时出错: %s", e)
+                        # 使用 AudioCodec 类中的方法重新初始化，重建流需要等待设备，不在事件循环中执行
+                        self._run_blocking(self.audio_codec._reinitialize_output_stream)
             # 停止输入流
             if self.audio_codec.input_stream and self.audio_codec.input_stream.is_active():
                 try:
                     self.audio_codec.input_stream.stop_stream()
                 except Exception as e:
-                    logger.warning(f"停止输入流时出错: {e}")
+                    logger.warning("停止输入流时出错: %s", e)
             # 非空闲状态暂停唤醒词检测
-            if self.wake_word_detector and self.wake_word_detector.is_running():
-                self.wake_word_detector.pause()
+            if self.wake_word_detector:
+                self._run_blocking(self._pause_wake_word_detector)
 
         # 通知状态变化
         for callback in self.on_state_changed_callbacks:
             try:
                 callback(state)
             except Exception as e:
-                logger.error(f"执行状态变化回调时出错: {e}")
+                logger.error("执行状态变化回调时出错: %s", e)
 
     def _get_status_text(self):
         """获取当前状态文本"""
-        states = {
-            DeviceState.IDLE: "待命",
-            DeviceState.CONNECTING: "连接中...",
-            DeviceState.LISTENING: "聆听中...",
-            DeviceState.SPEAKING: "说话中..."
-        }
-        return states.get(self.device_state, "未知")
+        return self._status_text
 
     def _get_current_text(self):
         """获取当前显示文本"""
@@ -578,30 +633,7 @@ class Application:
 
     def _get_current_emotion(self):
         """获取当前表情"""
-        emotions = {
-            "neutral": "😶",
-            "happy": "🙂",
-            "laughing": "😆",
-            "funny": "😂",
-            "sad": "😔",
-            "angry": "😠",
-            "crying": "😭",
-            "loving": "😍",
-            "embarrassed": "😳",
-            "surprised": "😲",
-            "shocked": "😱",
-            "thinking": "🤔",
-            "winking": "😉",
-            "cool": "😎",
-            "relaxed": "😌",
-            "delicious": "🤤",
-            "kissy": "😘",
-            "confident": "😏",
-            "sleepy": "😴",
-            "silly": "😜",
-            "confused": "🙄"
-        }
-        return emotions.get(self.current_emotion, "😶")
+        return self._emotion_icon
 
     def set_chat_message(self, role, message):
         """设置聊天消息"""
@@ -613,15 +645,16 @@ class Application:
     def set_emotion(self, emotion):
         """设置表情"""
         self.current_emotion = emotion
+        self._emotion_icon = EMOTION_ICONS.get(emotion, "😶")
         # 更新显示
         if self.display:
-            self.display.update_emotion(self._get_current_emotion())
+            self.display.update_emotion(self._emotion_icon)
 
     def start_listening(self):
         """开始监听"""
         self.schedule(self._start_listening_impl)
 
-    def _start_listening_impl(self):
+    async def _start_listening_impl(self):
         """开始监听的实现"""
         if not self.protocol:
             logger.error("协议未初始化")
@@ -629,42 +662,38 @@ class Application:
 
         self.keep_listening = False
 
-        self.wake_word_detector.pause()
+        if self.wake_word_detector:
+            self._run_blocking(self._pause_wake_word_detector)
 
         if self.device_state == DeviceState.IDLE:
             self.set_device_state(DeviceState.CONNECTING)  # 设置设备状态为连接中
 
-            # 尝试打开音频通道
-            if not self.protocol.is_audio_channel_opened():
-                try:
-                    # 等待异步操作完成
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.protocol.open_audio_channel(),
-                        self.loop
-                    )
-                    # 等待操作完成并获取结果
-                    success = future.result(timeout=5.0)  # 添加超时时间
-                    
-                    if not success:
-                        self.alert("错误", "打开音频通道失败")  # 弹出错误提示
-                        self.set_device_state(DeviceState.IDLE)  # 设置设备状态为空闲
-                        return
-                        
-                except Exception as e:
-                    logger.error(f"打开音频通道时发生错误: {e}")
-                    self.alert("错误", f"打开音频通道失败: {str(e)}")
-                    self.set_device_state(DeviceState.IDLE)
-                    return
+            # 尝试打开音频通道，失败时已回到空闲状态
+            if not await self._ensure_audio_channel():
+                return
 
-            asyncio.run_coroutine_threadsafe(
-                self.protocol.send_start_listening(ListeningMode.MANUAL),
-                self.loop
-            )
+            await self.protocol.send_start_listening(ListeningMode.MANUAL)
             self.set_device_state(DeviceState.LISTENING)  # 设置设备状态为监听中
         elif self.device_state == DeviceState.SPEAKING:
             if not self.aborted:
                 self.abort_speaking(AbortReason.WAKE_WORD_DETECTED)
 
+    async def _ensure_audio_channel(self):
+        """确保音频通道已打开，在事件循环中等待（最多 5 秒），失败时提示并回到空闲状态"""
+        if self.protocol.is_audio_channel_opened():
+            return True
+        try:
+            success = await asyncio.wait_for(self.protocol.open_audio_channel(), timeout=5.0)
+        except Exception as e:
+            logger.error("打开音频通道时发生错误: %s", e)
+            self.alert("错误", f"打开音频通道失败: {str(e)}")
+            self.set_device_state(DeviceState.IDLE)
+            return False
+        if not success:
+            self.alert("错误", "打开音频通道失败")  # 弹出错误提示
+            self.set_device_state(DeviceState.IDLE)  # 设置设备状态为空闲
+        return success
+
     async def _open_audio_channel_and_start_manual_listening(self):
         """打开音频通道并开始手动监听"""
         if not await self.protocol.open_audio_channel():
@@ -677,10 +706,11 @@ class Application:
 
     def toggle_chat_state(self):
         """切换聊天状态"""
-        self.wake_word_detector.pause()
+        if self.wake_word_detector:
+            self._run_blocking(self._pause_wake_word_detector)
         self.schedule(self._toggle_chat_state_impl)
 
-    def _toggle_chat_state_impl(self):
+    async def _toggle_chat_state_impl(self):
         """切换聊天状态的具体实现"""
         # 检查协议是否已初始化
         if not self.protocol:
@@ -691,34 +721,13 @@ class Application:
         if self.device_state == DeviceState.IDLE:
             self.set_device_state(DeviceState.CONNECTING)  # 设置设备状态为连接中
 
-            # 尝试打开音频通道
-            if not self.protocol.is_audio_channel_opened():
-                try:
-                    # 等待异步操作完成
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.protocol.open_audio_channel(),
-                        self.loop
-                    )
-                    # 等待操作完成并获取结果
-                    success = future.result(timeout=5.0)  # 添加超时时间
-                    
-                    if not success:
-                        self.alert("错误", "打开音频通道失败")  # 弹出错误提示
-                        self.set_device_state(DeviceState.IDLE)  # 设置设备状态为空闲
-                        return
-                        
-                except Exception as e:
-                    logger.error(f"打开音频通道时发生错误: {e}")
-                    self.alert("错误", f"打开音频通道失败: {str(e)}")
-                    self.set_device_state(DeviceState.IDLE)
-                    return
+            # 尝试打开音频通道，失败时已回到空闲状态
+            if not await self._ensure_audio_channel():
+                return
 
             self.keep_listening = True  # 开始监听
             # 启动自动停止的监听模式
-            asyncio.run_coroutine_threadsafe(
-                self.protocol.send_start_listening(ListeningMode.AUTO_STOP),
-                self.loop
-            )
+            await self.protocol.send_start_listening(ListeningMode.AUTO_STOP)
             self.set_device_state(DeviceState.LISTENING)  # 设置设备状态为监听中
 
         # 如果设备正在说话，停止当前说话
@@ -727,10 +736,7 @@ class Application:
 
         # 如果设备正在监听，关闭音频通道
         elif self.device_state == DeviceState.LISTENING:
-            asyncio.run_coroutine_threadsafe(
-                self.protocol.close_audio_channel(),
-                self.loop
-            )
+            await self.protocol.close_audio_channel()
 
     def stop_listening(self):
         """停止监听"""
@@ -747,8 +753,11 @@ class Application:
 
     def abort_speaking(self, reason):
         """中止语音输出"""
-        logger.info(f"中止语音输出，原因: {reason}")
+        logger.info("中止语音输出，原因: %s", reason)
         self.aborted = True
+        # 丢弃未播放的音频，离开 SPEAKING 状态时无需再等待队列播放完
+        if self.audio_codec:
+            self.audio_codec.clear_audio_queue()
         asyncio.run_coroutine_threadsafe(
             self.protocol.send_abort_speaking(reason),
             self.loop
@@ -759,15 +768,14 @@ class Application:
         if reason == AbortReason.WAKE_WORD_DETECTED and self.keep_listening:
             # 短暂延迟确保abort命令被处理
             def start_listening_after_abort():
-                time.sleep(0.2)  # 短暂延迟
                 self.set_device_state(DeviceState.IDLE)
-                self.schedule(lambda: self.toggle_chat_state())
+                self.schedule(self.toggle_chat_state)
 
-            threading.Thread(target=start_listening_after_abort, daemon=True).start()
+            self.call_later(0.2, start_listening_after_abort)
 
     def alert(self, title, message):
         """显示警告信息"""
-        logger.warning(f"警告: {title}, {message}")
+        logger.warning("警告: %s, %s", title, message)
         # 在GUI上显示警告
         if self.display:
             self.display.update_text(f"{title}: {message}")
@@ -776,11 +784,24 @@ class Application:
         """注册状态变化回调"""
         self.on_state_changed_callbacks.append(callback)
 
+    def request_shutdown(self):
+        """请求退出应用程序，可在任意线程调用，由 run() 在主线程完成关闭"""
+        self.shutdown_requested.set()
+        if self.display:
+            self.display.request_close()
+
     def shutdown(self):
         """关闭应用程序"""
         logger.info("正在关闭应用程序...")
         self.running = False
 
+        # 丢弃尚未执行的阻塞操作，等待正在执行的一项完成，之后在主线程中关闭设备
+        self._blocking_executor.shutdown(wait=True, cancel_futures=True)
+
+        # 停止唤醒词检测，需在关闭音频编解码器之前，检测器的输入流来自编解码器的 PyAudio 实例
+        if self.wake_word_detector:
+            self.wake_word_detector.close()
+
         # 关闭音频编解码器
         if self.audio_codec:
             self.audio_codec.close()
@@ -800,45 +821,45 @@ class Application:
         if self.loop_thread and self.loop_thread.is_alive():
             self.loop_thread.join(timeout=1.0)
 
-        # 停止唤醒词检测
-        if self.wake_word_detector:
-            self.wake_word_detector.stop()
-
         logger.info("应用程序已关闭")
 
     def _handle_verification_code(self, text):
         """处理验证码信息"""
-        global host
         try:
             # 提取验证码
-            import re
-            verification_code = re.search(r'验证码：(\d+)', text)
+            verification_code = _VCODE_RE.search(text)
             if verification_code:
                 code = verification_code.group(1)
 
-                # 尝试复制到剪贴板
-                try:
-                    import pyperclip
-                    pyperclip.copy(code)
-                    logger.info(f"验证码 {code} 已复制到剪贴板")
-                except Exception as e:
-                    logger.warning(f"无法复制验证码到剪贴板: {e}")
-
-                # 尝试打开浏览器
-                try:
-                    import webbrowser
-                    if webbrowser.open(host):
-                        logger.info("已打开登录页面")
-                    else:
-                        logger.warning("无法打开浏览器")
-                except Exception as e:
-                    logger.warning(f"打开浏览器时出错: {e}")
+                # 复制剪贴板和启动浏览器可能阻塞数秒，交给工作线程执行
+                self._run_blocking(self._copy_code_and_open_login_page, code)
 
                 # 无论如何都显示验证码
                 self.alert("验证码", f"您的验证码是: {code}")
 
         except Exception as e:
-            logger.error(f"处理验证码时出错: {e}")
+            logger.error("处理验证码时出错: %s", e)
+
+    def _copy_code_and_open_login_page(self, code):
+        """复制验证码到剪贴板并打开登录页面，在工作线程中执行"""
+        global host
+        # 尝试复制到剪贴板
+        try:
+            if pyperclip is None:
+                raise RuntimeError("未安装 pyperclip")
+            pyperclip.copy(code)
+            logger.info("验证码 %s 已复制到剪贴板", code)
+        except Exception as e:
+            logger.warning("无法复制验证码到剪贴板: %s", e)
+
+        # 尝试打开浏览器
+        try:
+            if webbrowser.open(host):
+                logger.info("已打开登录页面")
+            else:
+                logger.warning("无法打开浏览器")
+        except Exception as e:
+            logger.warning("打开浏览器时出错: %s", e)
 
     def _on_mode_changed(self, auto_mode):
         """处理对话模式变更"""
@@ -848,42 +869,42 @@ class Application:
             return False
 
         self.keep_listening = auto_mode
-        logger.info(f"对话模式已切换为: {'自动' if auto_mode else '手动'}")
+        logger.info("对话模式已切换为: %s", '自动' if auto_mode else '手动')
         return True
 
     def _initialize_wake_word_detector(self):
         """初始化唤醒词检测器"""
         try:
             from src.audio_processing.wake_word_detect import WakeWordDetector
-            self.wake_word_detector = WakeWordDetector(wake_words=self.config.get_config("WAKE_WORDS"),model_path=self.config.get_config("WAKE_WORD_MODEL_PATH"))
+            self.wake_word_detector = WakeWordDetector(wake_words=self.config.get_config("WAKE_WORDS"),model_path=self.config.get_config("WAKE_WORD_MODEL_PATH"),audio=self.audio_codec.audio if self.audio_codec else None)
             # 注册唤醒词检测回调
             self.wake_word_detector.on_detected(self._on_wake_word_detected)
             logger.info("唤醒词检测器初始化成功")
 
             # 添加错误处理回调
             def on_error(error):
-                logger.error(f"唤醒词检测错误: {error}")
+                logger.error("唤醒词检测错误: %s", error)
                 # 尝试重新启动检测器
                 if self.device_state == DeviceState.IDLE:
-                    self.schedule(lambda: self._restart_wake_word_detector())
+                    self.schedule(self._restart_wake_word_detector)
 
             self.wake_word_detector.on_error = on_error
 
         except Exception as e:
-            logger.error(f"初始化唤醒词检测器失败: {e}")
+            logger.error("初始化唤醒词检测器失败: %s", e)
             self.wake_word_detector = None
 
     def _on_wake_word_detected(self, wake_word, full_text):
         """唤醒词检测回调"""
-        logger.info(f"检测到唤醒词: {wake_word} (完整文本: {full_text})")
-        self.schedule(lambda: self._handle_wake_word_detected(wake_word))
+        logger.info("检测到唤醒词: %s (完整文本: %s)", wake_word, full_text)
+        self.schedule(partial(self._handle_wake_word_detected, wake_word))
 
     def _handle_wake_word_detected(self, wake_word):
         """处理唤醒词检测事件"""
         if self.device_state == DeviceState.IDLE:
             # 暂停唤醒词检测
             if self.wake_word_detector:
-                self.wake_word_detector.pause()
+                self._run_blocking(self._pause_wake_word_detector)
 
             # 开始连接并监听
             self.set_device_state(DeviceState.CONNECTING)
@@ -903,7 +924,7 @@ class Application:
             self.set_device_state(DeviceState.IDLE)
             # 恢复唤醒词检测
             if self.wake_word_detector:
-                self.wake_word_detector.resume()
+                self._run_blocking(self.wake_word_detector.resume)
             return
 
         # 然后尝试打开音频通道
@@ -913,7 +934,7 @@ class Application:
             self.alert("错误", "打开音频通道失败")
             # 恢复唤醒词检测
             if self.wake_word_detector:
-                self.wake_word_detector.resume()
+                self._run_blocking(self.wake_word_detector.resume)
             return
 
         await self.protocol.send_wake_word_detected(wake_word)
@@ -922,14 +943,23 @@ class Application:
         await self.protocol.send_start_listening(ListeningMode.AUTO_STOP)
         self.set_device_state(DeviceState.LISTENING)
 
+    def _pause_wake_word_detector(self):
+        """暂停正在运行的唤醒词检测，与启动、恢复在同一工作线程中按顺序执行"""
+        if self.wake_word_detector.is_running():
+            self.wake_word_detector.pause()
+
     def _restart_wake_word_detector(self):
-        """重新启动唤醒词检测器"""
+        """重新启动唤醒词检测器，停止时需等待检测线程退出，交给工作线程执行"""
         logger.info("尝试重新启动唤醒词检测器")
         if self.wake_word_detector:
-            self.wake_word_detector.stop()
-            time.sleep(0.5)  # 给予一些时间让资源释放
-            try:
-                self.wake_word_detector.start()
-                logger.info("唤醒词检测器重新启动成功")
-            except Exception as e:
-                logger.error(f"重新启动唤醒词检测器失败: {e}")
+            self._run_blocking(self.wake_word_detector.stop)
+
+            def start_detector():
+                try:
+                    self.wake_word_detector.start()
+                    logger.info("唤醒词检测器重新启动成功")
+                except Exception as e:
+                    logger.error("重新启动唤醒词检测器失败: %s", e)
+
+            # 给予一些时间让资源释放，延迟期间不阻塞事件循环
+            self.call_later(0.5, partial(self._run_blocking, start_detector))
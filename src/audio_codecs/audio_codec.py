@@ -1,14 +1,118 @@
 import logging
 import queue
-import numpy as np
+import threading
 import pyaudio
 import opuslib
+from src.audio_codecs.opus_codec import OpusDecoder, OpusEncoder
 from src.constants.constants import AudioConfig
 import time
 import sys
 
 logger = logging.getLogger("AudioCodec")
 
+# 每帧采样数
+FRAME_SIZE = AudioConfig.FRAME_SIZE
+
+# 每个采样点（所有声道）的 PCM 字节数（paInt16）
+SAMPLE_BYTES = AudioConfig.CHANNELS * 2
+
+# 每帧 PCM 字节数
+FRAME_BYTES = FRAME_SIZE * SAMPLE_BYTES
+
+# 解码线程每批最多处理的包数
+DECODE_BATCH_SIZE = 10
+
+# 编码线程积压的麦克风帧超过该数量时丢弃最旧的帧，保证上行音频的实时性
+ENCODE_BACKLOG_FRAMES = 20
+
+# 放入旧解码队列，唤醒等待中的解码线程切换到新队列
+_QUEUE_REPLACED = object()
+
+
+class PcmRingBuffer:
+    """预分配的 PCM 环形缓冲区，解码线程写入，输出流回调读取"""
+
+    def __init__(self, capacity):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._capacity = capacity
+        self._head = 0  # 读位置
+        self._size = 0  # 已缓存的字节数
+        self._generation = 0  # 每次清空加一，用于唤醒并丢弃等待中的写入
+        self._silence = b""  # 缓存的静音帧
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def generation(self):
+        """当前清空代数"""
+        return self._generation
+
+    def write(self, data, generation=None):
+        """写入数据，空间不足时等待输出回调取走
+
+        缓冲区在 generation 之后（或等待期间）被 clear() 过时丢弃本次数据并返回 False
+        """
+        data = memoryview(data)
+        size = len(data)
+        with self._cond:
+            if generation is None:
+                generation = self._generation
+            elif generation != self._generation:
+                return False
+            while self._capacity - self._size < size:
+                self._cond.wait()
+                if self._generation != generation:
+                    return False
+            tail = (self._head + self._size) % self._capacity
+            first = min(size, self._capacity - tail)
+            self._view[tail:tail + first] = data[:first]
+            if first < size:
+                self._view[:size - first] = data[first:]
+            self._size += size
+        return True
+
+    def read(self, size):
+        """读取 size 字节，不足部分补静音"""
+        with self._cond:
+            count = min(size, self._size)
+            if count == 0:
+                # 没有待播放数据时（输出流空闲的常态）直接返回缓存的静音帧，不分配也不拷贝
+                if len(self._silence) != size:
+                    self._silence = bytes(size)
+                return self._silence
+            first = min(count, self._capacity - self._head)
+            if first == size:
+                data = self._view[self._head:self._head + first].tobytes()
+            else:
+                # 跨越缓冲区末尾或需要补静音时只拼接一次
+                parts = [self._view[self._head:self._head + first]]
+                if first < count:
+                    parts.append(self._view[:count - first])
+                if count < size:
+                    parts.append(bytes(size - count))
+                data = b"".join(parts)
+            self._head = (self._head + count) % self._capacity
+            self._size -= count
+            # 唤醒等待空间的写入方和等待播放完的一方
+            self._cond.notify_all()
+        return data
+
+    def wait_empty(self, timeout=None):
+        """等待缓冲区中的数据被全部取走，超时返回 False"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._size == 0, timeout)
+
+    def clear(self):
+        """清空缓冲区"""
+        with self._cond:
+            self._head = 0
+            self._size = 0
+            self._generation += 1
+            self._cond.notify_all()
+
 
 class AudioCodec:
     """音频编解码器类，处理音频的录制和播放"""
@@ -20,45 +124,49 @@ class AudioCodec:
         self.output_stream = None
         self.opus_encoder = None
         self.opus_decoder = None
-        self.audio_decode_queue = queue.Queue()
+        # 待编码的 PCM 帧和待解码的 Opus 包，分别由常驻的编码/解码线程处理
+        self._encode_queue = queue.SimpleQueue()
+        self.audio_decode_queue = queue.SimpleQueue()
+        # 已放入解码队列但尚未解码完的包数，用于等待播放完成
+        self._pending_packets = 0
+        self._pending_cond = threading.Condition()
+        # 解码后等待输出回调取走的 PCM 数据，最多缓存 32 帧，写满时解码线程等待
+        self._pcm_buffer = PcmRingBuffer(FRAME_BYTES * 32)
+        # 为 True 时才采集并编码麦克风数据
+        self.capture_enabled = False
+        # 输入回调，参数为编码后的一帧 Opus 数据，在编码线程中调用
+        self.on_input_audio = None
         self._is_closing = False  # 添加关闭状态标志
 
         self._initialize_audio()
 
+        # 编解码器在各自线程中运行，不占用事件循环和声卡回调
+        self._encoder_thread = threading.Thread(target=self._encoder_loop, daemon=True)
+        self._encoder_thread.start()
+        self._decoder_thread = threading.Thread(target=self._decoder_loop, daemon=True)
+        self._decoder_thread.start()
+
     def _initialize_audio(self):
         """初始化音频设备和编解码器"""
         try:
             self.audio = pyaudio.PyAudio()
 
-            # 初始化音频输入流
-            self.input_stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=AudioConfig.CHANNELS,
-                rate=AudioConfig.SAMPLE_RATE,
-                input=True,
-                frames_per_buffer=AudioConfig.FRAME_SIZE
-            )
-
-            # 初始化音频输出流
-            self.output_stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=AudioConfig.CHANNELS,
-                rate=AudioConfig.SAMPLE_RATE,
-                output=True,
-                frames_per_buffer=AudioConfig.FRAME_SIZE
-            )
+            # 初始化音频输入/输出流
+            self.input_stream = self._open_input_stream()
+            self.output_stream = self._open_output_stream()
 
             # 初始化Opus编码器
-            self.opus_encoder = opuslib.Encoder(
+            self.opus_encoder = OpusEncoder(
                 fs=AudioConfig.SAMPLE_RATE,
                 channels=AudioConfig.CHANNELS,
                 application=opuslib.APPLICATION_AUDIO
             )
 
             # 初始化Opus解码器
-            self.opus_decoder = opuslib.Decoder(
+            self.opus_decoder = OpusDecoder(
                 fs=AudioConfig.SAMPLE_RATE,
-                channels=AudioConfig.CHANNELS
+                channels=AudioConfig.CHANNELS,
+                max_frame_size=AudioConfig.FRAME_SIZE
             )
 
             logger.info("音频设备和编解码器初始化成功")
@@ -66,99 +174,164 @@ class AudioCodec:
             logger.error(f"初始化音频设备失败: {e}")
             raise
 
-    def read_audio(self):
-        """读取音频输入数据并编码"""
-        try:
-            data = self.input_stream.read(AudioConfig.FRAME_SIZE, exception_on_overflow=False)
-            if not data:
-                return None
-            return self.opus_encoder.encode(data, AudioConfig.FRAME_SIZE)
-        except Exception as e:
-            logger.error(f"读取音频输入时出错: {e}")
-            return None
+    def _open_input_stream(self):
+        """打开回调模式的输入流，由声卡按帧驱动采集"""
+        return self.audio.open(
+            format=pyaudio.paInt16,
+            channels=AudioConfig.CHANNELS,
+            rate=AudioConfig.SAMPLE_RATE,
+            input=True,
+            frames_per_buffer=AudioConfig.FRAME_SIZE,
+            stream_callback=self._input_callback
+        )
+
+    def _open_output_stream(self):
+        """打开回调模式的输出流，由声卡按帧拉取 PCM 数据"""
+        return self.audio.open(
+            format=pyaudio.paInt16,
+            channels=AudioConfig.CHANNELS,
+            rate=AudioConfig.SAMPLE_RATE,
+            output=True,
+            frames_per_buffer=AudioConfig.FRAME_SIZE,
+            stream_callback=self._output_callback
+        )
+
+    def _input_callback(self, in_data, frame_count, time_info, status):
+        """输入流回调，每采集一帧调用一次，只把数据交给编码线程"""
+        if self.capture_enabled:
+            self._encode_queue.put(in_data)
+        return None, pyaudio.paContinue
+
+    def _output_callback(self, in_data, frame_count, time_info, status):
+        """输出流回调，从 PCM 缓冲区取出一帧，不足部分补静音"""
+        return self._pcm_buffer.read(frame_count * SAMPLE_BYTES), pyaudio.paContinue
+
+    def _encoder_loop(self):
+        """编码线程，把采集到的 PCM 帧编码为 Opus 后交给输入回调"""
+        # 每帧都会用到的方法和常量绑定为局部变量，省去循环内的属性查找
+        get = self._encode_queue.get
+        backlog = self._encode_queue.qsize
+        encode = self.opus_encoder.encode
+        frame_size = FRAME_SIZE
+        while True:
+            pcm_data = get()
+            if pcm_data is None:
+                break
+            if backlog() > ENCODE_BACKLOG_FRAMES:
+                # 编码线程被拖慢时只编码最新的帧，过期的麦克风数据发出去只会增加延迟
+                dropped = 0
+                while backlog() > ENCODE_BACKLOG_FRAMES:
+                    pcm_data = get()
+                    if pcm_data is None:
+                        return
+                    dropped += 1
+                logger.warning("编码积压，已丢弃 %d 帧过期的麦克风音频", dropped)
+            try:
+                encoded_data = encode(pcm_data, frame_size)
+            except Exception as e:
+                logger.error(f"编码音频数据时出错: {e}")
+                continue
+            if self.on_input_audio:
+                try:
+                    self.on_input_audio(encoded_data)
+                except Exception as e:
+                    logger.error(f"处理音频输入时出错: {e}")
 
     def write_audio(self, opus_data):
-        """将编码的音频数据添加到播放队列"""
+        """将编码的音频数据添加到播放队列，可在任意线程调用"""
+        with self._pending_cond:
+            self._pending_packets += 1
         self.audio_decode_queue.put(opus_data)
 
-    def play_audio(self):
-        """处理并播放队列中的音频数据"""
-        try:
-            # 批量处理多个音频包以减少处理延迟
-            batch_size = min(10, self.audio_decode_queue.qsize())
-            if batch_size == 0:
-                return False
-
-            # 创建缓冲区存储解码后的数据
-            buffer = bytearray()
-
-            for _ in range(batch_size):
-                if self.audio_decode_queue.empty():
+    def _decoder_loop(self):
+        """解码线程，解码队列中的音频数据后交给输出流回调播放"""
+        # 每帧都会用到的方法和常量绑定为局部变量，省去循环内的属性查找
+        decode_into = self.opus_decoder.decode_into
+        pcm_buffer = self._pcm_buffer
+        write = pcm_buffer.write
+        frame_size = FRAME_SIZE
+        decode_queue = self.audio_decode_queue
+        # 一批数据连续解码到同一块预分配内存，整批一次写入输出缓冲区
+        batch = bytearray(FRAME_BYTES * DECODE_BATCH_SIZE)
+        batch_view = memoryview(batch)
+        while True:
+            # 取数据前记下清空代数，之后被打断时这一批整体丢弃
+            generation = pcm_buffer.generation
+            opus_data = decode_queue.get()
+            if opus_data is None:
+                break
+            if decode_queue is not self.audio_decode_queue:
+                # 队列已被 clear_audio_queue 整体替换，旧队列中剩余的数据直接丢弃
+                decode_queue = self.audio_decode_queue
+                continue
+
+            # 批量处理已到达的音频包以减少处理延迟；直接 get_nowait 到队列取空为止，
+            # 不再每个包先调用一次 empty()
+            packets = [opus_data]
+            get_nowait = decode_queue.get_nowait
+            while len(packets) < DECODE_BATCH_SIZE:
+                try:
+                    opus_data = get_nowait()
+                except queue.Empty:
                     break
+                if opus_data is None:
+                    return
+                if opus_data is _QUEUE_REPLACED:
+                    # 取批期间队列被替换，之后从新队列取数据；已取出的这一批属于清空前的代数，写入时会被丢弃
+                    decode_queue = self.audio_decode_queue
+                    break
+                packets.append(opus_data)
 
-                opus_data = self.audio_decode_queue.get_nowait()
+            # 解码结果已是 paInt16 的字节布局，libopus 直接写入批缓冲区
+            size = 0
+            for opus_data in packets:
                 try:
-                    pcm_data = self.opus_decoder.decode(opus_data, AudioConfig.FRAME_SIZE, decode_fec=False)
-                    buffer.extend(pcm_data)
+                    size += decode_into(opus_data, batch, size, frame_size)
                 except Exception as e:
                     logger.error(f"解码音频数据时出错: {e}")
 
-            # 只有在有数据时才处理和播放
-            if len(buffer) > 0:
-                # 转换为numpy数组
-                pcm_array = np.frombuffer(buffer, dtype=np.int16)
+            # 被清空（打断或停止播放）时整批丢弃
+            if size:
+                write(batch_view[:size], generation)
 
-                # 播放音频
-                try:
-                    if self.output_stream and self.output_stream.is_active():
-                        self.output_stream.write(pcm_array.tobytes())
-                        return True
-                    else:
-                        # MAC 特定：如果流不活跃，尝试重新初始化
-                        self._reinitialize_output_stream()
-                        if self.output_stream and self.output_stream.is_active():
-                            self.output_stream.write(pcm_array.tobytes())
-                            return True
-                except OSError as e:
-                    if "Stream closed" in str(e) or "Internal PortAudio error" in str(e):
-                        logger.error(f"播放音频时出错: {e}")
-                        self._reinitialize_output_stream()
-                    else:
-                        logger.error(f"播放音频时出错: {e}")
-        except queue.Empty:
-            pass
-        except Exception as e:
-            logger.error(f"播放音频时出错: {e}")
-            self._reinitialize_output_stream()
+            self._packets_done(len(packets), generation)
 
-        return False
+    def _packets_done(self, count, generation):
+        """解码线程处理完一批数据，清空之前取出的批次不再计数"""
+        with self._pending_cond:
+            if generation != self._pcm_buffer.generation:
+                return
+            self._pending_packets -= count
+            if self._pending_packets <= 0:
+                self._pending_cond.notify_all()
 
     def has_pending_audio(self):
         """检查是否还有待播放的音频数据"""
-        return not self.audio_decode_queue.empty()
+        return self._pending_packets > 0 or len(self._pcm_buffer) > 0
 
     def wait_for_audio_complete(self, timeout=5.0):
-        # 等待音频队列清空
-        attempt = 0
-        max_attempts = 15
-        while not self.audio_decode_queue.empty() and attempt < max_attempts:
-            time.sleep(0.1)
-            attempt += 1
-
-        # 在关闭前清空任何剩余数据
-        while not self.audio_decode_queue.empty():
-            try:
-                self.audio_decode_queue.get_nowait()
-            except queue.Empty:
-                break
+        """等待已收到的音频全部解码并播放完，由解码线程和输出回调通知，超时后丢弃剩余数据"""
+        deadline = time.monotonic() + timeout
+        with self._pending_cond:
+            self._pending_cond.wait_for(lambda: self._pending_packets <= 0, timeout)
+        self._pcm_buffer.wait_empty(max(0.0, deadline - time.monotonic()))
+
+        # 清空任何剩余数据
+        self.clear_audio_queue()
 
     def clear_audio_queue(self):
-        """清空音频队列"""
-        while not self.audio_decode_queue.empty():
-            try:
-                self.audio_decode_queue.get_nowait()
-            except queue.Empty:
-                break
+        """清空音频队列
+
+        直接换上新队列而不是逐个取出，旧队列交给解码线程丢弃，耗时与积压的数据量无关
+        """
+        # 先推进清空代数，解码线程正在处理的一批数据随之作废
+        with self._pending_cond:
+            self._pcm_buffer.clear()
+            self._pending_packets = 0
+            self._pending_cond.notify_all()
+        old_queue = self.audio_decode_queue
+        self.audio_decode_queue = queue.SimpleQueue()
+        old_queue.put(_QUEUE_REPLACED)
 
     def start_streams(self):
         """启动音频流"""
@@ -193,18 +366,36 @@ class AudioCodec:
             if sys.platform in ('darwin', 'linux'):
                 time.sleep(0.1)
 
-            self.output_stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=AudioConfig.CHANNELS,
-                rate=AudioConfig.SAMPLE_RATE,
-                output=True,
-                frames_per_buffer=AudioConfig.FRAME_SIZE
-            )
+            self.output_stream = self._open_output_stream()
             logger.info("音频输出流重新初始化成功")
         except Exception as e:
             logger.error(f"重新初始化音频输出流失败: {e}")
             raise
 
+    def _reinitialize_input_stream(self):
+        """重新初始化音频输入流"""
+        if self._is_closing:  # 如果正在关闭，不要重新初始化
+            return
+
+        try:
+            if self.input_stream:
+                try:
+                    if self.input_stream.is_active():
+                        self.input_stream.stop_stream()
+                    self.input_stream.close()
+                except Exception:
+                    pass
+
+            # 在 MAC 上添加短暂延迟
+            if sys.platform in ('darwin', 'linux'):
+                time.sleep(0.1)
+
+            self.input_stream = self._open_input_stream()
+            logger.info("音频输入流重新初始化成功")
+        except Exception as e:
+            logger.error(f"重新初始化音频输入流失败: {e}")
+            raise
+
     def close(self):
         """关闭音频编解码器，确保资源正确释放"""
         if self._is_closing:  # 防止重复关闭
@@ -214,8 +405,8 @@ class AudioCodec:
         logger.info("开始关闭音频编解码器...")
 
         try:
-            # 等待并清理剩余音频数据
-            self.wait_for_audio_complete()
+            # 等待并清理剩余音频数据，关闭时最多等待 1.5 秒
+            self.wait_for_audio_complete(timeout=1.5)
 
             # 关闭输入流
             if self.input_stream:
@@ -248,6 +439,10 @@ class AudioCodec:
                     logger.error(f"终止 PyAudio 时出错: {e}")
                 self.audio = None
 
+            # 停止编码/解码线程
+            self._encode_queue.put(None)
+            self.audio_decode_queue.put(None)
+
             # 清理编解码器
             self.opus_encoder = None
             self.opus_decoder = None
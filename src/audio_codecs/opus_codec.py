@@ -0,0 +1,79 @@
+import ctypes
+
+import opuslib
+import opuslib.api.decoder
+import opuslib.api.encoder
+
+# Opus 单包的最大字节数（libopus 推荐值）
+MAX_PACKET_BYTES = 4000
+
+
+class OpusEncoder:
+    """Opus 编码器，直接调用 libopus 并复用预分配的输出缓冲区
+
+    opuslib.Encoder.encode 每次调用都会新建 ctypes 缓冲区并经过 array 多次拷贝，
+    这里每帧只有一次 ctypes 调用和一次结果拷贝。实例不是线程安全的，应只在一个线程中使用。
+    """
+
+    def __init__(self, fs, channels, application=opuslib.APPLICATION_AUDIO):
+        self._state = opuslib.api.encoder.create_state(fs, channels, application)
+        self._output = ctypes.create_string_buffer(MAX_PACKET_BYTES)
+
+    def encode(self, pcm_data, frame_size):
+        """把一帧 PCM（paInt16 字节）编码为 Opus 包"""
+        pcm_pointer = ctypes.cast(pcm_data, opuslib.api.c_int16_pointer)
+        result = opuslib.api.encoder.libopus_encode(
+            self._state, pcm_pointer, frame_size, self._output, MAX_PACKET_BYTES
+        )
+        if result < 0:
+            raise opuslib.OpusError(result)
+        return ctypes.string_at(self._output, result)
+
+    def __del__(self):
+        if getattr(self, "_state", None):
+            opuslib.api.encoder.destroy(self._state)
+            self._state = None
+
+
+class OpusDecoder:
+    """Opus 解码器，直接调用 libopus 并复用预分配的 PCM 缓冲区
+
+    opuslib.Decoder.decode 会把解码结果逐个样本转换为 Python 列表再转回字节，
+    这里直接从 ctypes 缓冲区拷贝一次。实例不是线程安全的，应只在一个线程中使用。
+    """
+
+    def __init__(self, fs, channels, max_frame_size):
+        self._state = opuslib.api.decoder.create_state(fs, channels)
+        self._channels = channels
+        self._max_frame_size = max_frame_size
+        self._pcm = (ctypes.c_int16 * (max_frame_size * channels))()
+        self._pcm_pointer = ctypes.cast(self._pcm, opuslib.api.c_int16_pointer)
+
+    def decode(self, opus_data, frame_size=None, decode_fec=False):
+        """把一个 Opus 包解码为 PCM（paInt16 字节）"""
+        frame_size = min(frame_size or self._max_frame_size, self._max_frame_size)
+        result = opuslib.api.decoder.libopus_decode(
+            self._state, opus_data, len(opus_data), self._pcm_pointer, frame_size, int(decode_fec)
+        )
+        if result < 0:
+            raise opuslib.OpusError(result)
+        return ctypes.string_at(self._pcm, result * self._channels * 2)
+
+    def decode_into(self, opus_data, buffer, offset=0, frame_size=None, decode_fec=False):
+        """把一个 Opus 包直接解码到可写缓冲区 buffer 的 offset 字节处，返回写入的字节数
+
+        buffer 需有 offset 之后至少一帧的空间，可用于把多个包连续解码到同一块内存中
+        """
+        frame_size = min(frame_size or self._max_frame_size, self._max_frame_size)
+        pcm = (ctypes.c_int16 * (frame_size * self._channels)).from_buffer(buffer, offset)
+        result = opuslib.api.decoder.libopus_decode(
+            self._state, opus_data, len(opus_data), pcm, frame_size, int(decode_fec)
+        )
+        if result < 0:
+            raise opuslib.OpusError(result)
+        return result * self._channels * 2
+
+    def __del__(self):
+        if getattr(self, "_state", None):
+            opuslib.api.decoder.destroy(self._state)
+            self._state = None
@@ -1,16 +1,34 @@
-import json
+import functools
 import logging
+import queue
 import threading
-import time
 import pyaudio
 import os
+import re
 from vosk import Model, KaldiRecognizer, SetLogLevel
 from pypinyin import lazy_pinyin
 from src.utils.config_manager import ConfigManager
 
+# orjson 为可选依赖，安装后用它解析 Vosk 的识别结果
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # 配置日志
 logger = logging.getLogger("Application")
 
+# 检测循环出错后的等待时间（秒），连续出错时从最小值逐次翻倍到最大值；
+# on_error 会触发检测器重启，最小值不宜过小，避免持续故障时连续请求重启
+_ERROR_BACKOFF_MIN = 0.1
+_ERROR_BACKOFF_MAX = 2.0
+
+
+@functools.lru_cache(maxsize=128)
+def _text_to_pinyin(text):
+    """把识别文本转换为去掉空格的拼音串，识别结果经常重复，缓存最近的转换结果"""
+    return ''.join(lazy_pinyin(text.replace(" ", "")))
+
 
 class WakeWordDetector:
     """唤醒词检测类"""
@@ -20,7 +38,8 @@ class WakeWordDetector:
                  model_path=None,
                  sensitivity=0.5,
                  sample_rate=16000,
-                 buffer_size=4000):
+                 buffer_size=4000,
+                 audio=None):
         """
         初始化唤醒词检测器
 
@@ -30,12 +49,15 @@ class WakeWordDetector:
             sensitivity: 检测灵敏度 (0.0-1.0)
             sample_rate: 音频采样率
             buffer_size: 音频缓冲区大小
+            audio: 共享的 PyAudio 实例，由调用方负责终止；为空时检测器自行创建并在启动间复用
         """
         # 初始化基本属性
         self.on_detected_callbacks = []
         self.running = False
         self.detection_thread = None
         self.audio_stream = None
+        # 输入流回调采集到的音频块，由检测线程取出识别
+        self._audio_queue = queue.SimpleQueue()
         
         # 检查是否启用唤醒词功能
         config = ConfigManager.get_instance()
@@ -58,7 +80,15 @@ class WakeWordDetector:
         ])
 
         # 预先计算唤醒词的拼音
-        self.wake_words_pinyin = [''.join(lazy_pinyin(word)) for word in self.wake_words]
+        self.wake_words_pinyin = tuple(''.join(lazy_pinyin(word)) for word in self.wake_words)
+        # 所有唤醒词拼音合并为一个正则，一次扫描完成匹配；拼音对应第一个同拼音的唤醒词
+        self._pinyin_to_word = {}
+        for word, pinyin in zip(self.wake_words, self.wake_words_pinyin):
+            self._pinyin_to_word.setdefault(pinyin, word)
+        patterns = [re.escape(pinyin) for pinyin in self._pinyin_to_word if pinyin]
+        self._wake_word_re = re.compile('|'.join(patterns)) if patterns else None
+        # 拼音比最短的唤醒词拼音还短的识别结果不可能匹配，无需扫描
+        self._min_pinyin_len = min((len(pinyin) for pinyin in self._pinyin_to_word if pinyin), default=0)
 
         # 初始化模型
         if model_path is None:
@@ -70,8 +100,15 @@ class WakeWordDetector:
 
         # 状态变量
         self.paused = False
-        self.audio = None
+        # 暂停时清除，检测线程阻塞等待恢复而不是轮询 paused
+        self._resume_event = threading.Event()
+        # 停止时置位，出错退避等待中的检测线程可立即退出
+        self._stop_event = threading.Event()
+        # 重新启动时复用同一个 PyAudio 实例，避免反复初始化和终止 PortAudio
+        self.audio = audio
+        self._owns_audio = audio is None
         self.stream = None
+        self._owns_stream = False
 
         # 回调函数
         self.on_error = None  # 添加错误处理回调
@@ -101,22 +138,30 @@ class WakeWordDetector:
         
         try:
             # 初始化音频
+            self._audio_queue = queue.SimpleQueue()
             if audio_stream:
                 self.stream = audio_stream
-                self.audio = None
+                self._owns_stream = False
             else:
-                self.audio = pyaudio.PyAudio()
+                # 回调模式由 PortAudio 线程推送数据，检测线程忙于识别时也不会输入溢出；
+                # 每次回调交付完整的 buffer_size 帧，减少识别器调用和线程切换次数
+                if self.audio is None:
+                    self.audio = pyaudio.PyAudio()
+                self._owns_stream = True
                 self.stream = self.audio.open(
                     format=pyaudio.paInt16,
                     channels=1,
                     rate=self.sample_rate,
                     input=True,
-                    frames_per_buffer=self.buffer_size
+                    frames_per_buffer=self.buffer_size,
+                    stream_callback=self._audio_callback
                 )
 
             # 启动检测线程
             self.running = True
             self.paused = False
+            self._resume_event.set()
+            self._stop_event.clear()
             self.detection_thread = threading.Thread(
                 target=self._detection_loop,
                 daemon=True
@@ -138,7 +183,10 @@ class WakeWordDetector:
         if self.running:
             self.running = False
             self.paused = False
-            
+            # 唤醒暂停或退避等待中的检测线程，使其退出
+            self._resume_event.set()
+            self._stop_event.set()
+
             if self.detection_thread and self.detection_thread.is_alive():
                 self.detection_thread.join(timeout=1.0)
                 self.detection_thread = None
@@ -151,24 +199,29 @@ class WakeWordDetector:
                     self.stream = None
                 except Exception as e:
                     logger.error(f"停止音频流时出错: {e}")
-            
-            if self.audio:
-                try:
-                    self.audio.terminate()
-                    self.audio = None
-                except Exception as e:
-                    logger.error(f"终止音频设备时出错: {e}")
+
+    def close(self):
+        """停止检测并释放检测器自己创建的 PyAudio 实例"""
+        self.stop()
+        if self.audio and self._owns_audio:
+            try:
+                self.audio.terminate()
+            except Exception as e:
+                logger.error(f"终止音频设备时出错: {e}")
+            self.audio = None
 
     def pause(self):
         """暂停唤醒词检测"""
         if self.running and not self.paused:
             self.paused = True
+            self._resume_event.clear()
             logger.info("唤醒词检测已暂停")
 
     def resume(self):
         """恢复唤醒词检测"""
         if self.running and self.paused:
             self.paused = False
+            self._resume_event.set()
             # 如果流已关闭，重新启动检测
             if not self.stream or not self.stream.is_active():
                 self.start()
@@ -189,27 +242,33 @@ class WakeWordDetector:
     def _cleanup(self):
         """清理资源"""
         # 只有当我们创建了自己的音频流时才关闭它
-        if self.audio and self.stream:
+        if self._owns_stream and self.stream:
             try:
                 if self.stream.is_active():
                     self.stream.stop_stream()
                 self.stream.close()
-                self.audio.terminate()
             except Exception as e:
                 logger.error(f"清理音频资源时出错: {e}")
 
         self.stream = None
-        self.audio = None
+        self._owns_stream = False
+
+    def _audio_callback(self, in_data, frame_count, time_info, status):
+        """输入流回调，暂停时直接丢弃数据，否则交给检测线程"""
+        if not self.paused:
+            self._audio_queue.put(in_data)
+        return None, pyaudio.paContinue
 
     def _check_wake_word(self, text):
         """检查文本中是否包含唤醒词（仅使用拼音匹配）"""
-        # 将输入文本转换为拼音
-        text_pinyin = ''.join(lazy_pinyin(text))
-        text_pinyin = text_pinyin.replace(" ", "")  # 移除空格
+        # 将输入文本转换为拼音（同音字也能匹配，因此不能按汉字预先过滤）
+        text_pinyin = _text_to_pinyin(text)
+        if len(text_pinyin) < self._min_pinyin_len:
+            return False, None
         # 只进行拼音匹配
-        for i, pinyin in enumerate(self.wake_words_pinyin):
-            if pinyin in text_pinyin:
-                return True, self.wake_words[i]
+        match = self._wake_word_re.search(text_pinyin) if self._wake_word_re else None
+        if match:
+            return True, self._pinyin_to_word[match.group()]
 
         return False, None
 
@@ -221,16 +280,25 @@ class WakeWordDetector:
         logger.info("唤醒词检测循环已启动")
         error_count = 0
         max_errors = 3
+        # 外部传入的音频流仍使用阻塞读取，自己创建的流由回调推送数据
+        external_stream = not self._owns_stream
+        audio_queue = self._audio_queue
+        backoff = _ERROR_BACKOFF_MIN
 
         while self.running:
             try:
                 if self.paused:
-                    time.sleep(0.1)
+                    self._resume_event.wait()
                     continue
 
                 # 读取音频数据
                 try:
-                    data = self.stream.read(self.buffer_size // 2, exception_on_overflow=False)
+                    if external_stream:
+                        data = self.stream.read(self.buffer_size, exception_on_overflow=False)
+                    else:
+                        data = audio_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
                 except Exception as e:
                     error_count += 1
                     if error_count >= max_errors:
@@ -246,11 +314,10 @@ class WakeWordDetector:
 
                 # 处理音频数据
                 if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
-                    print("语音检测",result)
+                    result = json_loads(self.recognizer.Result())
                     if "text" in result and result["text"].strip():
                         text = result["text"]
-                        logger.debug(f"识别文本: {text}")
+                        logger.debug("识别文本: %s", text)
 
                         # 检查是否包含唤醒词
                         detected, wake_word = self._check_wake_word(text)
@@ -264,8 +331,13 @@ class WakeWordDetector:
                                 except Exception as e:
                                     logger.error(f"执行唤醒词检测回调时出错: {e}")
 
+                # 一块音频完整处理成功后才结束本轮退避
+                backoff = _ERROR_BACKOFF_MIN
+
             except Exception as e:
                 logger.error(f"唤醒词检测循环出错: {e}")
-                if self.on_error:
+                # 同一轮连续出错只通知一次，恢复正常后重新计算
+                if self.on_error and backoff == _ERROR_BACKOFF_MIN:
                     self.on_error(str(e))
-                time.sleep(0.1)
\ No newline at end of file
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, _ERROR_BACKOFF_MAX)
\ No newline at end of file
@@ -16,12 +16,6 @@ class DeviceState:
     LISTENING = "listening"
     SPEAKING = "speaking"
 
-class EventType:
-    """事件类型"""
-    SCHEDULE_EVENT = "schedule_event"
-    AUDIO_INPUT_READY_EVENT = "audio_input_ready_event"
-    AUDIO_OUTPUT_READY_EVENT = "audio_output_ready_event"
-
 class AudioConfig:
     """音频配置"""
     SAMPLE_RATE = 24000
@@ -1,6 +1,25 @@
 from abc import ABC, abstractmethod
 from typing import Optional, Callable
 import logging
+import platform
+import shutil
+import subprocess
+
+# pyalsaaudio 为可选依赖（Linux），安装后在进程内设置音量，不再每次启动 amixer/pactl 子进程
+try:
+    import alsaaudio
+except ImportError:
+    alsaaudio = None
+
+# 运行期间操作系统不会变化，只检测一次
+_SYSTEM = platform.system()
+
+# Linux 下依次尝试的音量命令，调用时在末尾追加 "音量%"
+_LINUX_VOLUME_COMMANDS = (
+    ("amixer", "-D", "pulse", "sset", "Master"),
+    ("amixer", "sset", "Master"),
+    ("pactl", "set-sink-volume", "@DEFAULT_SINK@"),
+)
 
 class BaseDisplay(ABC):
     """显示接口的抽象基类"""
@@ -8,6 +27,10 @@ class BaseDisplay(ABC):
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.current_volume = 70  # 默认音量
+        # 音量接口在首次调节时确定，之后直接复用
+        self._windows_volume_control = None
+        self._alsa_mixer = None
+        self._linux_volume_command = None
 
     @abstractmethod
     def set_callbacks(self,
@@ -45,8 +68,7 @@ class BaseDisplay(ABC):
     def update_volume(self, volume: int):
         """更新系统音量 - 跨平台实现"""
         try:
-            import platform
-            system = platform.system()
+            system = _SYSTEM
 
             if system == "Windows":
                 self._set_windows_volume(volume)
@@ -64,18 +86,23 @@ class BaseDisplay(ABC):
     def _set_windows_volume(self, volume: int):
         """设置Windows系统音量"""
         try:
-            from ctypes import cast, POINTER
-            from comtypes import CLSCTX_ALL
-            from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+            volume_control = self._windows_volume_control
+            if volume_control is None:
+                from ctypes import cast, POINTER
+                from comtypes import CLSCTX_ALL
+                from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
 
-            devices = AudioUtilities.GetSpeakers()
-            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            volume_control = cast(interface, POINTER(IAudioEndpointVolume))
+                devices = AudioUtilities.GetSpeakers()
+                interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+                volume_control = cast(interface, POINTER(IAudioEndpointVolume))
+                self._windows_volume_control = volume_control
 
             volume_db = -65.25 * (1 - volume / 100.0)
             volume_control.SetMasterVolumeLevel(volume_db, None)
             self.logger.debug(f"Windows音量已设置为: {volume}%")
         except Exception as e:
+            # 默认设备可能已变化，下次重新获取
+            self._windows_volume_control = None
             self.logger.warning(f"设置Windows音量失败: {e}")
 
     def _set_macos_volume(self, volume: int):
@@ -88,50 +115,53 @@ class BaseDisplay(ABC):
             self.logger.warning(f"设置macOS音量失败: {e}")
 
     def _set_linux_volume(self, volume: int):
-        """设置Linux系统音量"""
-        import subprocess
-        import shutil
-
-        def cmd_exists(cmd):
-            return shutil.which(cmd) is not None
-
-        if cmd_exists("amixer"):
-            try:
-                result = subprocess.run(
-                    ["amixer", "-D", "pulse", "sset", "Master", f"{volume}%"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0:
-                    self.logger.debug(f"Linux音量(amixer/pulse)已设置为: {volume}%")
+        """设置Linux系统音量，记住上次成功的命令，下次直接使用"""
+        if alsaaudio is not None and self._set_alsa_volume(volume):
+            return
+
+        cached = self._linux_volume_command
+        if cached and self._run_linux_volume_command(cached, volume):
+            return
+
+        for command in _LINUX_VOLUME_COMMANDS:
+            if command != cached and shutil.which(command[0]):
+                if self._run_linux_volume_command(command, volume):
+                    self._linux_volume_command = command
                     return
 
-                result = subprocess.run(
-                    ["amixer", "sset", "Master", f"{volume}%"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0:
-                    self.logger.debug(f"Linux音量(amixer)已设置为: {volume}%")
-                    return
-            except Exception as e:
-                self.logger.debug(f"amixer设置音量失败: {e}")
-
-        if cmd_exists("pactl"):
-            try:
-                result = subprocess.run(
-                    ["pactl", "set-sink-volume", "@DEFAULT_SINK@", f"{volume}%"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0:
-                    self.logger.debug(f"Linux音量(pactl)已设置为: {volume}%")
-                    return
-            except Exception as e:
-                self.logger.debug(f"pactl设置音量失败: {e}")
-
+        self._linux_volume_command = None
         self.logger.error("无法设置Linux音量，请确保安装了ALSA或PulseAudio")
 
+    def _set_alsa_volume(self, volume: int):
+        """通过 pyalsaaudio 设置默认声卡的 Master 音量，成功返回 True"""
+        try:
+            mixer = self._alsa_mixer
+            if mixer is None:
+                mixer = self._alsa_mixer = alsaaudio.Mixer("Master")
+            mixer.setvolume(volume)
+        except alsaaudio.ALSAAudioError as e:
+            self._alsa_mixer = None
+            self.logger.debug(f"alsaaudio设置音量失败: {e}")
+            return False
+        self.logger.debug(f"Linux音量(alsaaudio)已设置为: {volume}%")
+        return True
+
+    def _run_linux_volume_command(self, command, volume: int):
+        """执行一条音量命令，成功返回 True"""
+        try:
+            result = subprocess.run(
+                [*command, f"{volume}%"],
+                capture_output=True,
+                text=True
+            )
+        except Exception as e:
+            self.logger.debug(f"{command[0]}设置音量失败: {e}")
+            return False
+        if result.returncode != 0:
+            return False
+        self.logger.debug(f"Linux音量({command[0]})已设置为: {volume}%")
+        return True
+
     @abstractmethod
     def start(self):
         """启动显示"""
@@ -142,6 +172,10 @@ class BaseDisplay(ABC):
         """关闭显示"""
         pass
 
+    def request_close(self):
+        """请求关闭显示，可在任意线程调用"""
+        self.on_close()
+
     @abstractmethod
     def start_keyboard_listener(self):
         """启动键盘监听"""
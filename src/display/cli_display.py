@@ -36,6 +36,13 @@ class CliDisplay(BaseDisplay):
         self.last_emotion = None
         self.last_volume = None
 
+        # 状态由应用在变化时推送，更新可能来自事件循环和键盘线程，加锁避免交错输出
+        self._update_lock = threading.Lock()
+        # 上次从回调读到的值，只在回调结果变化时覆盖推送的值
+        self._polled_status = None
+        self._polled_text = None
+        self._polled_emotion = None
+
         self.keyboard_listener = None
 
     def set_callbacks(self,
@@ -59,22 +66,41 @@ class CliDisplay(BaseDisplay):
         print(f"按钮状态: {text}")
 
     def update_status(self, status: str):
-        """更新状态文本"""
-        if status != self.current_status:
+        """更新状态文本，可在任意线程调用"""
+        with self._update_lock:
             self.current_status = status
-            self._print_current_status()
+            self._refresh_status()
 
     def update_text(self, text: str):
-        """更新TTS文本"""
-        if text != self.current_text:
+        """更新TTS文本，可在任意线程调用"""
+        with self._update_lock:
             self.current_text = text
-            self._print_current_status()
+            self._refresh_status()
 
     def update_emotion(self, emotion: str):
-        """更新表情"""
-        if emotion != self.current_emotion:
+        """更新表情，可在任意线程调用"""
+        with self._update_lock:
             self.current_emotion = emotion
-            self._print_current_status()
+            self._refresh_status()
+
+    def _refresh_status(self):
+        """读取回调中的最新状态、文本和表情，有变化时打印"""
+        try:
+            if self.status_callback:
+                status = self.status_callback()
+                if status and status != self._polled_status:
+                    self._polled_status = self.current_status = status
+            if self.text_callback:
+                text = self.text_callback()
+                if text and text != self._polled_text:
+                    self._polled_text = self.current_text = text
+            if self.emotion_callback:
+                emotion = self.emotion_callback()
+                if emotion and emotion != self._polled_emotion:
+                    self._polled_emotion = self.current_emotion = emotion
+        except Exception as e:
+            logger.error(f"状态更新错误: {e}")
+        self._print_current_status()
 
     def start_keyboard_listener(self):
         """启动键盘监听"""
@@ -115,9 +141,6 @@ class CliDisplay(BaseDisplay):
     def start(self):
         """启动CLI显示"""
         self._print_help()
-        
-        # 启动状态更新线程
-        self.start_update_threads()
 
         # 启动键盘监听线程
         keyboard_thread = threading.Thread(target=self._keyboard_listener)
@@ -185,36 +208,6 @@ class CliDisplay(BaseDisplay):
         except Exception as e:
             logger.error(f"键盘监听错误: {e}")
 
-    def start_update_threads(self):
-        """启动更新线程"""
-        def update_loop():
-            while self.running:
-                try:
-                    # 更新状态
-                    if self.status_callback:
-                        status = self.status_callback()
-                        if status and status != self.current_status:
-                            self.update_status(status)
-
-                    # 更新文本
-                    if self.text_callback:
-                        text = self.text_callback()
-                        if text and text != self.current_text:
-                            self.update_text(text)
-
-                    # 更新表情
-                    if self.emotion_callback:
-                        emotion = self.emotion_callback()
-                        if emotion and emotion != self.current_emotion:
-                            self.update_emotion(emotion)
-
-                except Exception as e:
-                    logger.error(f"状态更新错误: {e}")
-                time.sleep(0.1)
-
-        # 启动更新线程
-        threading.Thread(target=update_loop, daemon=True).start()
-
     def _print_current_status(self):
         """打印当前状态"""
         # 检查是否有状态变化
@@ -1,14 +1,16 @@
-import threading
 import tkinter as tk
 from tkinter import ttk
-import queue
+from collections import deque
 import logging
-import time
 from typing import Optional, Callable
 from pynput import keyboard as pynput_keyboard
 
 from src.display.base_display import BaseDisplay
 
+# Tk 主线程检查更新的间隔（毫秒）：有更新到达后短间隔处理后续更新，空闲时只做一次标志检查
+_UPDATE_INTERVAL_BUSY_MS = 20
+_UPDATE_INTERVAL_IDLE_MS = 100
+
 
 class GuiDisplay(BaseDisplay):
     def __init__(self):
@@ -87,8 +89,23 @@ class GuiDisplay(BaseDisplay):
         self.auto_callback = None
         self.abort_callback = None
 
-        # 更新队列
-        self.update_queue = queue.Queue()
+        # 更新队列，其他线程追加界面更新函数，由 Tk 主线程定时取出执行；其他线程从不直接调用 Tk
+        # deque 的 append/popleft 本身是原子操作，不需要 queue.Queue 的锁和条件变量
+        self.update_queue = deque()
+        # 状态、文本或表情有新值时置位，由 Tk 主线程检查后清除
+        self._refresh_requested = False
+
+        # 状态、文本和表情只记录最新值，由 Tk 主循环刷新时统一应用，值未变化时不重绘
+        self._pending_status = None
+        self._pending_text = None
+        self._pending_emotion = None
+        self._shown_status = None
+        self._shown_text = None
+        self._shown_emotion = None
+        # 上次从回调取到的值，回调的值变化时才覆盖直接设置的值
+        self._polled_status = None
+        self._polled_text = None
+        self._polled_emotion = None
 
         # 运行标志
         self._running = True
@@ -96,9 +113,6 @@ class GuiDisplay(BaseDisplay):
         # 设置窗口关闭处理
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        # 启动更新处理
-        self.root.after(100, self._process_updates)
-
         self.keyboard_listener = None
 
     def set_callbacks(self,
@@ -121,20 +135,30 @@ class GuiDisplay(BaseDisplay):
         self.abort_callback = abort_callback
 
 
+    def _request_refresh(self):
+        """标记有待应用的更新，可在任意线程调用，只设置标志，不调用 Tk"""
+        self._refresh_requested = True
+
     def _process_updates(self):
-        """处理更新队列"""
-        try:
-            while True:
-                try:
-                    # 非阻塞方式获取更新
-                    update_func = self.update_queue.get_nowait()
-                    update_func()
-                    self.update_queue.task_done()
-                except queue.Empty:
-                    break
-        finally:
-            if self._running:
-                self.root.after(100, self._process_updates)
+        """处理更新队列，在 Tk 主线程中定时执行；有更新时缩短下次检查的间隔"""
+        # 先清除标记，处理期间新到的更新留到下次处理
+        busy = self._refresh_requested or bool(self.update_queue)
+        self._refresh_requested = False
+        popleft = self.update_queue.popleft
+        while True:
+            try:
+                # 非阻塞方式获取更新
+                update_func = popleft()
+            except IndexError:
+                break
+            update_func()
+        if self._running:
+            if busy:
+                self._refresh_labels()
+            self.root.after(
+                _UPDATE_INTERVAL_BUSY_MS if busy else _UPDATE_INTERVAL_IDLE_MS,
+                self._process_updates
+            )
 
     def _on_manual_button_press(self, event):
         """手动模式按钮按下事件处理"""
@@ -194,13 +218,15 @@ class GuiDisplay(BaseDisplay):
                 self.update_mode_button_status("自动对话")
                 
                 # 隐藏手动按钮，显示自动按钮
-                self.update_queue.put(lambda: self._switch_to_auto_mode())
+                self.update_queue.append(lambda: self._switch_to_auto_mode())
+                self._request_refresh()
             else:
                 # 切换到手动模式
                 self.update_mode_button_status("手动对话")
                 
                 # 隐藏自动按钮，显示手动按钮
-                self.update_queue.put(lambda: self._switch_to_manual_mode())
+                self.update_queue.append(lambda: self._switch_to_manual_mode())
+                self._request_refresh()
                 
         except Exception as e:
             self.logger.error(f"模式切换按钮回调执行失败: {e}")
@@ -217,45 +243,49 @@ class GuiDisplay(BaseDisplay):
 
     def update_status(self, status: str):
         """更新状态文本"""
-        self.update_queue.put(lambda: self.status_label.config(text=f"状态: {status}"))
+        self._pending_status = status
+        self._request_refresh()
 
     def update_text(self, text: str):
         """更新TTS文本"""
-        self.update_queue.put(lambda: self.tts_text_label.config(text=text))
+        self._pending_text = text
+        self._request_refresh()
 
     def update_emotion(self, emotion: str):
         """更新表情"""
-        self.update_queue.put(lambda: self.emotion_label.config(text=emotion))
-
-    def start_update_threads(self):
-        """启动更新线程"""
-
-        def update_loop():
-            while self._running:
-                try:
-                    # 更新状态
-                    if self.status_update_callback:
-                        status = self.status_update_callback()
-                        if status:
-                            self.update_status(status)
-
-                    # 更新文本
-                    if self.text_update_callback:
-                        text = self.text_update_callback()
-                        if text:
-                            self.update_text(text)
-
-                    # 更新表情
-                    if self.emotion_update_callback:
-                        emotion = self.emotion_update_callback()
-                        if emotion:
-                            self.update_emotion(emotion)
-
-                except Exception as e:
-                    self.logger.error(f"更新失败: {e}")
-                time.sleep(0.1)
-
-        threading.Thread(target=update_loop, daemon=True).start()
+        self._pending_emotion = emotion
+        self._request_refresh()
+
+    def _refresh_labels(self):
+        """在 Tk 主线程中读取回调并应用最新的状态、文本和表情"""
+        try:
+            if self.status_update_callback:
+                status = self.status_update_callback()
+                if status and status != self._polled_status:
+                    self._polled_status = self._pending_status = status
+            if self.text_update_callback:
+                text = self.text_update_callback()
+                if text and text != self._polled_text:
+                    self._polled_text = self._pending_text = text
+            if self.emotion_update_callback:
+                emotion = self.emotion_update_callback()
+                if emotion and emotion != self._polled_emotion:
+                    self._polled_emotion = self._pending_emotion = emotion
+        except Exception as e:
+            self.logger.error(f"更新失败: {e}")
+
+        status = self._pending_status
+        if status is not None and status != self._shown_status:
+            self._shown_status = status
+            self.status_label.config(text=f"状态: {status}")
+        text = self._pending_text
+        if text is not None and text != self._shown_text:
+            self._shown_text = text
+            self.tts_text_label.config(text=text)
+        emotion = self._pending_emotion
+        if emotion is not None and emotion != self._shown_emotion:
+            self._shown_emotion = emotion
+            self.emotion_label.config(text=emotion)
 
     def on_close(self):
         """关闭窗口处理"""
@@ -263,24 +293,31 @@ class GuiDisplay(BaseDisplay):
         self.root.destroy()
         self.stop_keyboard_listener()
 
+    def request_close(self):
+        """请求关闭窗口，Tk 只能在主线程操作，交给更新队列执行"""
+        self.update_queue.append(self.on_close)
+        self._request_refresh()
+
     def start(self):
         """启动GUI"""
         # 启动键盘监听
         self.start_keyboard_listener()
-        # 启动更新线程
-        self.start_update_threads()
+        # 在 Tk 主线程中开始定时处理更新，包括主循环启动前积累的更新
+        self.root.after(0, self._process_updates)
         # 在主线程中运行主循环
         self.root.mainloop()
 
     def update_mode_button_status(self, text: str):
         """更新模式按钮状态"""
-        self.update_queue.put(lambda: self.mode_btn.config(text=text))
+        self.update_queue.append(lambda: self.mode_btn.config(text=text))
+        self._request_refresh()
 
     def update_button_status(self, text: str):
         """更新按钮状态 - 保留此方法以满足抽象基类要求"""
         # 根据当前模式更新相应的按钮
         if self.auto_mode:
-            self.update_queue.put(lambda: self.auto_btn.config(text=text))
+            self.update_queue.append(lambda: self.auto_btn.config(text=text))
+            self._request_refresh()
         else:
             # 在手动模式下，不通过此方法更新按钮文本
             # 因为按钮文本由按下/释放事件直接控制
@@ -1,21 +1,40 @@
 import asyncio
 import json
 import logging
-import time
-import uuid
 import socket
-import threading
+import uuid
+import struct
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
 import paho.mqtt.client as mqtt
 from src.utils.config_manager import ConfigManager
-from src.protocols.protocol import Protocol
+from src.protocols.protocol import Protocol, json_loads
 from src.constants.constants import AudioConfig
 
 
 # 配置日志
 logger = logging.getLogger("MqttProtocol")
 
+# UDP 音频通道的收发缓冲区大小，服务端会以快于实时的速度突发下发 TTS 音频，
+# 加大接收缓冲区避免事件循环繁忙时内核丢包。实际大小受 net.core.rmem_max / wmem_max 限制
+UDP_SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+
+# 发送 nonce 中的长度字段（偏移 2）和序列号字段（偏移 12），预编译避免每包解析格式串
+_NONCE_LENGTH = struct.Struct(">H")
+_NONCE_SEQUENCE = struct.Struct(">I")
+
+
+class _UdpAudioProtocol(asyncio.DatagramProtocol):
+    """UDP 音频通道，数据包由事件循环直接交给 MqttProtocol 处理"""
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def datagram_received(self, data, addr):
+        self._owner._handle_udp_packet(data)
+
+    def error_received(self, exc):
+        logger.error(f"UDP接收错误: {exc}")
+
 
 class MqttProtocol(Protocol):
     def __init__(self, loop):
@@ -23,9 +42,9 @@ class MqttProtocol(Protocol):
         self.loop = loop
         self.config = ConfigManager.get_instance()  # 在这里实例化
         self.mqtt_client = None
-        self.udp_socket = None
-        self.udp_thread = None
-        self.udp_running = False
+        # UDP 音频通道，由事件循环收发，不再占用单独的接收线程
+        self.udp_transport = None
+        self._udp_packet_count = 0
 
         # MQTT配置
         self.endpoint = None
@@ -40,6 +59,12 @@ class MqttProtocol(Protocol):
         self.udp_port = 0
         self.aes_key = None
         self.aes_nonce = None
+        # 收到 hello 时从十六进制字符串解析一次，发送每个包时只改写长度和序列号
+        self._aes_key_bytes = None
+        self._send_nonce = None
+        # 最近使用的密钥及其 AES 算法对象，每个包只需新建 CTR 模式的加解密器
+        self._aes_algorithm_key = None
+        self._aes_algorithm = None
         self.local_sequence = 0
         self.remote_sequence = 0
 
@@ -189,23 +214,17 @@ class MqttProtocol(Protocol):
                     await self.on_network_error("等待响应超时")
                 return False
 
-            # 创建UDP套接字
+            # 创建UDP通道，收到的数据包由事件循环回调处理
             try:
-                if self.udp_socket:
-                    self.udp_socket.close()
-
-                self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                self.udp_socket.settimeout(0.5)
+                self._close_udp_transport()
 
-                # 启动UDP接收线程
-                if self.udp_thread and self.udp_thread.is_alive():
-                    self.udp_running = False
-                    self.udp_thread.join(1.0)
-
-                self.udp_running = True
-                self.udp_thread = threading.Thread(target=self._udp_receive_thread)
-                self.udp_thread.daemon = True
-                self.udp_thread.start()
+                self._udp_packet_count = 0
+                self.udp_transport, _ = await self.loop.create_datagram_endpoint(
+                    lambda: _UdpAudioProtocol(self),
+                    remote_addr=(self.udp_server, self.udp_port)
+                )
+                self._set_udp_buffer_sizes()
+                logger.info(f"UDP音频通道已打开，服务器: {self.udp_server}:{self.udp_port}")
 
                 return True
             except Exception as e:
@@ -223,7 +242,7 @@ class MqttProtocol(Protocol):
     def _handle_mqtt_message(self, payload):
         """处理MQTT消息"""
         try:
-            data = json.loads(payload)
+            data = json_loads(payload)
             msg_type = data.get("type")
 
             if msg_type == "goodbye":
@@ -259,6 +278,8 @@ class MqttProtocol(Protocol):
                 self.udp_port = udp.get("port")
                 self.aes_key = udp.get("key")
                 self.aes_nonce = udp.get("nonce")
+                self._aes_key_bytes = bytes.fromhex(self.aes_key)
+                self._send_nonce = bytearray.fromhex(self.aes_nonce)
 
                 # 重置序列号
                 self.local_sequence = 0
@@ -291,69 +312,45 @@ class MqttProtocol(Protocol):
         except Exception as e:
             logger.error(f"处理MQTT消息时出错: {e}")
 
-    def _udp_receive_thread(self):
-        """UDP接收线程
-
-        参考 audio_player.py 的实现方式
-        """
-        logger.info(f"UDP接收线程已启动，监听来自 {self.udp_server}:{self.udp_port} 的数据")
-
-        self.udp_running = True
-        debug_counter = 0
-
-        while self.udp_running:
-            try:
-                data, addr = self.udp_socket.recvfrom(4096)
-                debug_counter += 1
-
-                try:
-                    # 验证数据包
-                    if len(data) < 16:  # 至少需要16字节的nonce
-                        logger.error(f"无效的音频数据包大小: {len(data)}")
-                        continue
-
-                    # 分离nonce和加密数据
-                    received_nonce = data[:16]
-                    encrypted_audio = data[16:]
-
-                    # 使用AES-CTR解密
-                    decrypted = self.aes_ctr_decrypt(
-                        bytes.fromhex(self.aes_key),
-                        received_nonce,
-                        encrypted_audio
-                    )
-
-                    # 调试信息
-                    if debug_counter % 100 == 0:
-                        logger.debug(f"已解密音频数据包 #{debug_counter}, 大小: {len(decrypted)} 字节")
+    def _handle_udp_packet(self, data):
+        """处理收到的 UDP 音频数据包，在事件循环线程中执行"""
+        self._udp_packet_count += 1
+        try:
+            # 验证数据包
+            if len(data) < 16:  # 至少需要16字节的nonce
+                logger.error(f"无效的音频数据包大小: {len(data)}")
+                return
 
-                    # 处理解密后的音频数据
-                    if self.on_incoming_audio:
-                        def process_audio(audio_data=decrypted):
+            # 分离nonce和加密数据（memoryview 切片不拷贝），使用AES-CTR解密；
+            # 解密结果会交给解码线程异步处理，因此每个包仍需独立的输出对象
+            view = memoryview(data)
+            decrypted = self.aes_ctr_decrypt(
+                self._aes_key_bytes,
+                view[:16],
+                view[16:]
+            )
 
-                            if asyncio.iscoroutinefunction(self.on_incoming_audio):
-                                coro = self.on_incoming_audio(audio_data)
-                                if coro is not None:
-                                    asyncio.create_task(coro)
-                            else:
-                                self.on_incoming_audio(audio_data)
+            # 调试信息
+            if self._udp_packet_count % 100 == 0:
+                logger.debug(f"已解密音频数据包 #{self._udp_packet_count}, 大小: {len(decrypted)} 字节")
 
-                        self.loop.call_soon_threadsafe(process_audio)
+            # 处理解密后的音频数据
+            if self.on_incoming_audio:
+                result = self.on_incoming_audio(decrypted)
+                if asyncio.iscoroutine(result):
+                    self.loop.create_task(result)
 
-                except Exception as e:
-                    logger.error(f"处理音频数据包错误: {e}")
-                    continue
+        except Exception as e:
+            logger.error(f"处理音频数据包错误: {e}")
 
-            except socket.timeout:
-                # 超时是正常的，继续循环
-                pass
+    def _close_udp_transport(self):
+        """关闭UDP通道"""
+        if self.udp_transport:
+            try:
+                self.udp_transport.close()
             except Exception as e:
-                logger.error(f"UDP接收线程错误: {e}")
-                if not self.udp_running:
-                    break
-                time.sleep(0.1)  # 避免在错误情况下过度消耗CPU
-
-        logger.info("UDP接收线程已停止")
+                logger.error(f"关闭UDP通道失败: {e}")
+            self.udp_transport = None
 
     async def send_text(self, message):
         """发送文本消息"""
@@ -376,36 +373,36 @@ class MqttProtocol(Protocol):
 
         参考 audio_sender.py 的实现方式
         """
-        if not self.udp_socket or not self.udp_server or not self.udp_port:
+        if not self.udp_transport:
             logger.error("UDP通道未初始化")
             return False
 
         try:
             # 生成新的nonce (类似于 audio_sender.py 中的实现)
-            # 格式: 0x01 (1字节) + 0x00 (3字节) + 长度 (2字节) + 原始nonce (8字节) + 序列号 (8字节)
+            # 格式: 固定前缀 (2字节) + 长度 (2字节) + 原始nonce (8字节) + 序列号 (4字节)，
+            # 在服务端下发的 nonce 上原地改写长度和序列号
             self.local_sequence = (self.local_sequence + 1) & 0xFFFFFFFF
-            new_nonce = (
-                    self.aes_nonce[:4] +  # 固定前缀
-                    format(len(audio_data), '04x') +  # 数据长度
-                    self.aes_nonce[8:24] +  # 原始nonce
-                    format(self.local_sequence, '08x')  # 序列号
-            )
+            nonce_buf = self._send_nonce
+            _NONCE_LENGTH.pack_into(nonce_buf, 2, len(audio_data))
+            _NONCE_SEQUENCE.pack_into(nonce_buf, 12, self.local_sequence)
+            new_nonce = bytes(nonce_buf)
 
+            # 加密接口接受任意字节缓冲区，不再额外拷贝一份音频数据
             encrypt_encoded_data = self.aes_ctr_encrypt(
-                bytes.fromhex(self.aes_key),
-                bytes.fromhex(new_nonce),
-                bytes(audio_data)
+                self._aes_key_bytes,
+                new_nonce,
+                audio_data
             )
 
             # 拼接nonce和密文
-            packet = bytes.fromhex(new_nonce) + encrypt_encoded_data
+            packet = new_nonce + encrypt_encoded_data
 
-            # 发送数据包
-            self.udp_socket.sendto(packet, (self.udp_server, self.udp_port))
+            # 发送数据包（UDP通道已连接到服务器地址）
+            self.udp_transport.sendto(packet)
 
             # 每发送10个包打印一次日志
             if self.local_sequence % 10 == 0:
-                logger.info(f"已发送音频数据包，序列号: {self.local_sequence}，目标: {self.udp_server}:{self.udp_port}")
+                logger.info("已发送音频数据包，序列号: %d，目标: %s:%s", self.local_sequence, self.udp_server, self.udp_port)
 
             self.local_sequence += 1
             return True
@@ -443,7 +440,7 @@ class MqttProtocol(Protocol):
 
     def is_audio_channel_opened(self):
         """检查音频通道是否已打开"""
-        return self.udp_socket is not None
+        return self.udp_transport is not None
 
     def get_server_sample_rate(self):
         """获取服务器采样率"""
@@ -458,9 +455,11 @@ class MqttProtocol(Protocol):
         Returns:
             bytes格式的加密数据
         """
-        cipher = Cipher(algorithms.AES(key), modes.CTR(nonce), backend=default_backend())
-        encryptor = cipher.encryptor()
-        return encryptor.update(plaintext) + encryptor.finalize()
+        encryptor = Cipher(self._get_aes_algorithm(key), modes.CTR(nonce)).encryptor()
+        # CTR 模式 finalize 不会输出数据，不再拼接一次
+        ciphertext = encryptor.update(plaintext)
+        encryptor.finalize()
+        return ciphertext
 
     def aes_ctr_decrypt(self, key, nonce, ciphertext):
         """AES-CTR模式解密函数
@@ -471,28 +470,35 @@ class MqttProtocol(Protocol):
         Returns:
             bytes格式的解密后的原始数据
         """
-        cipher = Cipher(algorithms.AES(key), modes.CTR(nonce), backend=default_backend())
-        decryptor = cipher.decryptor()
-        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+        decryptor = Cipher(self._get_aes_algorithm(key), modes.CTR(nonce)).decryptor()
+        plaintext = decryptor.update(ciphertext)
+        decryptor.finalize()
         return plaintext
 
+    def _set_udp_buffer_sizes(self):
+        """加大 UDP 套接字的收发缓冲区，设置失败时保持系统默认值"""
+        sock = self.udp_transport.get_extra_info("socket")
+        if sock is None:
+            return
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, option, UDP_SOCKET_BUFFER_SIZE)
+            except OSError as e:
+                logger.warning("设置UDP缓冲区大小失败: %s", e)
+
+    def _get_aes_algorithm(self, key):
+        """返回密钥对应的 AES 算法对象，会话内密钥不变，只在密钥变化时重新创建"""
+        if key != self._aes_algorithm_key:
+            self._aes_algorithm = algorithms.AES(key)
+            self._aes_algorithm_key = key
+        return self._aes_algorithm
+
     async def _handle_goodbye(self):
         """处理goodbye消息"""
         try:
-            # 停止UDP接收线程
-            if self.udp_thread and self.udp_thread.is_alive():
-                self.udp_running = False
-                self.udp_thread.join(1.0)
-                self.udp_thread = None
-            logger.info("UDP接收线程已停止")
-
-            # 关闭UDP套接字
-            if self.udp_socket:
-                try:
-                    self.udp_socket.close()
-                except Exception as e:
-                    logger.error(f"关闭UDP套接字失败: {e}")
-                self.udp_socket = None
+            # 关闭UDP通道
+            self._close_udp_transport()
+            logger.info("UDP音频通道已关闭")
 
             # 停止MQTT客户端
             if self.mqtt_client:
@@ -513,6 +519,8 @@ class MqttProtocol(Protocol):
             self.udp_port = 0
             self.aes_key = None
             self.aes_nonce = None
+            self._aes_key_bytes = None
+            self._send_nonce = None
 
             # 调用音频通道关闭回调
             if self.on_audio_channel_closed:
@@ -522,20 +530,11 @@ class MqttProtocol(Protocol):
             logger.error(f"处理goodbye消息时出错: {e}")
 
     def _stop_udp_receiver(self):
-        """停止UDP接收线程和关闭UDP套接字"""
-        # 关闭UDP接收线程
-        if hasattr(self, 'udp_thread') and self.udp_thread and self.udp_thread.is_alive():
-            self.udp_running = False
-            try:
-                self.udp_thread.join(1.0)
-            except RuntimeError:
-                pass  # 处理线程已经终止的情况
-
-        # 关闭UDP套接字
-        if hasattr(self, 'udp_socket') and self.udp_socket:
+        """关闭UDP通道"""
+        if getattr(self, 'udp_transport', None):
             try:
-                self.udp_socket.close()
-            except:
+                self.udp_transport.close()
+            except Exception:
                 pass
 
     def __del__(self):
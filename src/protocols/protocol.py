@@ -2,6 +2,12 @@ import json
 
 from src.constants.constants import AbortReason, ListeningMode
 
+# orjson 为可选依赖，安装后用它解析收到的 JSON 消息，其 JSONDecodeError 是 json.JSONDecodeError 的子类
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 
 class Protocol:
     def __init__(self):
@@ -4,7 +4,7 @@ import logging
 import websockets
 
 
-from src.protocols.protocol import Protocol
+from src.protocols.protocol import Protocol, json_loads
 from src.utils.config_manager import ConfigManager
 
 
@@ -89,7 +89,7 @@ class WebsocketProtocol(Protocol):
             async for message in self.websocket:
                 if isinstance(message, str):
                     try:
-                        data = json.loads(message)
+                        data = json_loads(message)
                         msg_type = data.get("type")
                         if msg_type == "hello":
                             # 处理服务器 hello 消息
@@ -20,10 +20,6 @@ class ConfigManager:
     CONFIG_DIR = Path(__file__).parent.parent.parent / "config"
     CONFIG_FILE = CONFIG_DIR / "config.json"
 
-    # 记录配置文件路径
-    logger.info(f"配置目录: {CONFIG_DIR.absolute()}")
-    logger.info(f"配置文件: {CONFIG_FILE.absolute()}")
-
     # 默认配置
     DEFAULT_CONFIG = {
         "CLIENT_ID": None,  # 将在首次运行时生成
@@ -55,6 +51,10 @@ class ConfigManager:
             return
         self._initialized = True
 
+        # 记录配置文件路径
+        logger.info("配置目录: %s", self.CONFIG_DIR.absolute())
+        logger.info("配置文件: %s", self.CONFIG_FILE.absolute())
+
         # 加载配置
         self._config = self._load_config()
         self._initialize_client_id()
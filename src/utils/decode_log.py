@@ -0,0 +1,45 @@
+"""把 XIAOZHI_LOG_FORMAT=binary 写出的二进制日志还原为文本
+
+用法: python -m src.utils.decode_log logs/app.binlog [更多文件...]
+"""
+import logging
+import sys
+import time
+
+from src.utils.logging_config import BINARY_RECORD_HEADER
+
+
+def iter_records(path):
+    """逐条读取二进制日志，返回 (时间戳, 级别, 记录器名, 消息)"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(BINARY_RECORD_HEADER.size)
+            if len(header) < BINARY_RECORD_HEADER.size:
+                # 文件结束或最后一条记录未写完整
+                return
+            created, levelno, name_len, message_len = BINARY_RECORD_HEADER.unpack(header)
+            name = f.read(name_len).decode("utf-8", "replace")
+            message = f.read(message_len).decode("utf-8", "replace")
+            yield created, levelno, name, message
+
+
+def format_record(created, levelno, name, message):
+    """按文本日志相同的格式输出一条记录"""
+    asctime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+    msecs = int((created - int(created)) * 1000)
+    return f"{asctime},{msecs:03d} - {name} - {logging.getLevelName(levelno)} - {message}"
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        return 2
+    for path in paths:
+        for record in iter_records(path):
+            print(format_record(*record))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
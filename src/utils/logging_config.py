@@ -1,19 +1,88 @@
+import atexit
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import struct
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+# 后台日志线程，负责把队列中的日志写到控制台和文件
+_listener = None
+
+# 二进制日志记录头：时间戳(秒)、级别、记录器名长度、消息长度，其后依次为名称和消息的 UTF-8 字节
+BINARY_RECORD_HEADER = struct.Struct("<dBHI")
+
+
+class BinaryFileHandler(TimedRotatingFileHandler):
+    """按天切割的二进制日志处理器
+
+    跳过 Formatter 的时间格式化和字符串拼接，直接写入定长记录头和原始字节，
+    使用 python -m src.utils.decode_log 还原为文本
+    """
+
+    def __init__(self, filename, **kwargs):
+        kwargs.pop("encoding", None)
+        # 延迟打开文件，改为二进制追加模式后由首次写入或切割时打开
+        kwargs["delay"] = True
+        super().__init__(filename, **kwargs)
+        self.mode = "ab"
+        self.encoding = None
+        self.errors = None
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            name = record.name.encode("utf-8")
+            message = record.getMessage().encode("utf-8", "replace")
+            self.stream.write(
+                BINARY_RECORD_HEADER.pack(record.created, record.levelno, len(name), len(message))
+                + name
+                + message
+            )
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
 def setup_logging():
-    """配置日志系统"""
+    """配置日志系统
+
+    设置环境变量 XIAOZHI_LOG=off 可关闭常规日志和日志文件，只在控制台保留 ERROR 及以上级别，
+    设置 XIAOZHI_LOG_FORMAT=binary 时文件日志改用二进制格式写入 logs/app.binlog
+    """
+    global _listener
+    # 关闭日志时不创建日志文件，WARNING 及以下的日志调用只做一次级别判断，错误仍输出到控制台
+    if os.environ.get("XIAOZHI_LOG", "on").lower() == "off":
+        stop_logging()
+        root_logger = logging.getLogger()
+        root_logger.handlers.clear()
+        error_handler = logging.StreamHandler()
+        error_handler.setLevel(logging.ERROR)
+        error_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        root_logger.addHandler(error_handler)
+        logging.disable(logging.WARNING)
+        return None
+
+    # 之前以关闭模式初始化过时恢复全部级别
+    logging.disable(logging.NOTSET)
+
     # 创建logs目录（如果不存在）
     log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'logs')
     os.makedirs(log_dir, exist_ok=True)
     
     # 日志文件路径
-    log_file = os.path.join(log_dir, 'app.log')
+    binary_log = os.environ.get("XIAOZHI_LOG_FORMAT", "text").lower() == "binary"
+    log_file = os.path.join(log_dir, 'app.binlog' if binary_log else 'app.log')
     
     # 创建根日志记录器
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)  # 设置根日志级别
     
+    # 重复调用时先停掉上一次创建的后台日志线程，避免重复初始化
+    stop_logging()
+
     # 清除已有的处理器（避免重复添加）
     if root_logger.handlers:
         root_logger.handlers.clear()
@@ -23,7 +92,10 @@ def setup_logging():
     console_handler.setLevel(logging.INFO)
     
     # 创建按天切割的文件处理器
-    file_handler = TimedRotatingFileHandler(
+    # 按时间切割每条日志只比较一次时间戳；不要换成按大小切割的 RotatingFileHandler，
+    # 它每写一条日志都要 seek+tell 检查文件大小
+    file_handler_class = BinaryFileHandler if binary_log else TimedRotatingFileHandler
+    file_handler = file_handler_class(
         log_file,
         when='midnight',  # 每天午夜切割
         interval=1,       # 每1天
@@ -37,16 +109,33 @@ def setup_logging():
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     console_handler.setFormatter(formatter)
     file_handler.setFormatter(formatter)
-    
-    # 添加处理器到根日志记录器
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+
+    # 调用线程只把日志放入队列，文件 I/O 交给后台线程处理；文件处理器逐条写入，进程异常退出时不丢日志
+    log_queue = queue.Queue(-1)
+    root_logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
     
     # 设置特定模块的日志级别
     logging.getLogger('Application').setLevel(logging.INFO)
     logging.getLogger('WebsocketProtocol').setLevel(logging.INFO)
     
     # 输出日志配置信息
-    logging.info(f"日志系统已初始化，日志文件: {log_file}")
+    logging.info("日志系统已初始化，日志文件: %s", log_file)
     
-    return log_file
\ No newline at end of file
+    return log_file
+
+
+def stop_logging():
+    """停止后台日志线程，确保队列中剩余的日志全部写出，并关闭处理器打开的文件"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+            handler.close()
+        _listener = None
+
+
+# 进程退出时写出剩余日志
+atexit.register(stop_logging)
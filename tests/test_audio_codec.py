@@ -0,0 +1,88 @@
+import queue
+import sys
+import threading
+import time
+import types
+import unittest
+
+# 测试不需要声卡和 libopus，缺少依赖时用空模块占位，只为能导入 audio_codec
+for _name in ("pyaudio", "opuslib", "opuslib.api", "opuslib.api.decoder", "opuslib.api.encoder"):
+    try:
+        __import__(_name)
+    except ImportError:
+        sys.modules[_name] = types.ModuleType(_name)
+sys.modules["opuslib"].APPLICATION_AUDIO = getattr(sys.modules["opuslib"], "APPLICATION_AUDIO", 2049)
+
+from src.audio_codecs.audio_codec import FRAME_BYTES, AudioCodec, PcmRingBuffer
+
+
+class _FakeDecoder:
+    """把每个包解码为一帧静音"""
+
+    def decode_into(self, opus_data, buffer, offset=0, frame_size=None, decode_fec=False):
+        return FRAME_BYTES
+
+
+class _SwapOnDrainQueue:
+    """第一次 get_nowait 时调用 clear_audio_queue，模拟解码线程取批期间队列被替换"""
+
+    def __init__(self, codec):
+        self._codec = codec
+        self._queue = queue.SimpleQueue()
+        self._swapped = False
+
+    def put(self, item):
+        self._queue.put(item)
+
+    def get(self, *args, **kwargs):
+        return self._queue.get(*args, **kwargs)
+
+    def get_nowait(self):
+        if not self._swapped:
+            self._swapped = True
+            self._codec.clear_audio_queue()
+        return self._queue.get_nowait()
+
+
+def _make_codec():
+    """不打开音频设备，只准备解码线程用到的状态"""
+    codec = AudioCodec.__new__(AudioCodec)
+    codec.opus_decoder = _FakeDecoder()
+    codec._pcm_buffer = PcmRingBuffer(FRAME_BYTES * 32)
+    codec._pending_packets = 0
+    codec._pending_cond = threading.Condition()
+    return codec
+
+
+class DecoderLoopTest(unittest.TestCase):
+    def test_queue_replaced_during_batch_drain(self):
+        codec = _make_codec()
+        old_queue = _SwapOnDrainQueue(codec)
+        codec.audio_decode_queue = old_queue
+        codec.write_audio(b"stale")
+
+        decoder = threading.Thread(target=codec._decoder_loop, daemon=True)
+        decoder.start()
+        try:
+            # 等待解码线程取批时换上新队列
+            deadline = time.monotonic() + 2.0
+            while codec.audio_decode_queue is old_queue and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertIsNot(codec.audio_decode_queue, old_queue)
+
+            # 新队列中的数据应被正常解码，清空前取出的旧数据被丢弃
+            codec.write_audio(b"fresh")
+            deadline = time.monotonic() + 2.0
+            while codec.has_pending_audio() and len(codec._pcm_buffer) == 0 \
+                    and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(codec._pcm_buffer), FRAME_BYTES)
+            self.assertEqual(codec._pending_packets, 0)
+        finally:
+            codec.audio_decode_queue.put(None)
+            decoder.join(timeout=1.0)
+        self.assertFalse(decoder.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()